@@ -0,0 +1,440 @@
+"""Offline benchmark for the contest reminder bot.
+
+Runs check_contests, reminder fan-out, broadcast and the command handlers
+against a stand-in Telegram Bot API and stand-in platform servers fed from
+bench/fixtures, with a synthetic population of chats. No network access is
+needed. Reports tick duration, sends per second, command latency, peak RSS
+and SQLite writes per phase.
+
+    python benchmark.py --chats 10000
+    python benchmark.py --chats 20000 --json results.json
+"""
+import argparse
+import asyncio
+import datetime
+import importlib
+import json
+import logging
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then reported as unknown.
+    resource = None
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench", "fixtures")
+# When the fixtures were recorded; their timestamps are shifted by
+# (now - RECORDED_AT) so the same contests are upcoming on every run.
+RECORDED_AT = 1760000000
+BENCH_TOKEN = "123456:benchmark"
+
+# ================= STAND-IN SERVERS =================
+
+def shift_codeforces(payload, delta):
+    for contest in payload["result"]:
+        contest["startTimeSeconds"] += delta
+
+def shift_leetcode(payload, delta):
+    for contest in payload["data"]["allContests"]:
+        contest["startTime"] += delta
+
+def shift_atcoder(payload, delta):
+    for contest in payload:
+        contest["start_epoch_second"] += delta
+
+def shift_codechef(payload, delta):
+    for key in ("present_contests", "future_contests", "past_contests"):
+        for contest in payload[key]:
+            for field in ("contest_start_date_iso", "contest_end_date_iso"):
+                moment = datetime.datetime.fromisoformat(contest[field])
+                contest[field] = (moment + datetime.timedelta(seconds=delta)).isoformat()
+
+FIXTURES = {
+    "codeforces": shift_codeforces,
+    "leetcode": shift_leetcode,
+    "atcoder": shift_atcoder,
+    "codechef": shift_codechef,
+}
+
+def load_fixtures():
+    delta = int(time.time()) - RECORDED_AT
+    payloads = {}
+    for name, shift in FIXTURES.items():
+        with open(os.path.join(FIXTURES_DIR, f"{name}.json"), encoding="utf-8") as f:
+            payload = json.load(f)
+        shift(payload, delta)
+        payloads[name] = payload
+    return payloads
+
+class StandInServer:
+    """Serves the platform payloads and the Bot API methods the bot calls."""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.bodies = {}
+        self.sends = 0
+        self._lock = threading.Lock()
+        for name in payloads:
+            self.publish(name)
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def publish(self, name):
+        """Re-encode a payload after it was changed."""
+        self.bodies[name] = json.dumps(self.payloads[name]).encode()
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+    def _count_send(self):
+        with self._lock:
+            self.sends += 1
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; without this every
+            # keep-alive response waits out the client's delayed ACK.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                name = self.path.strip("/").split("/")[0]
+                if name in stand_in.bodies:
+                    self._reply(stand_in.bodies[name])
+                elif self.path.endswith("/getMe"):
+                    self._reply(json.dumps({"ok": True, "result": {
+                        "id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot",
+                    }}).encode())
+                elif self.path.endswith("/sendMessage"):
+                    stand_in._count_send()
+                    chat_id = int(json.loads(raw)["chat_id"]) if raw.startswith(b"{") else 0
+                    self._reply(json.dumps({"ok": True, "result": {
+                        "message_id": 1, "date": int(time.time()),
+                        "chat": {"id": chat_id, "type": "private"}, "text": "",
+                    }}).encode())
+                else:
+                    self._reply(json.dumps({"ok": True, "result": True}).encode())
+
+            do_POST = do_GET
+
+            def _reply(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+# ================= POPULATION =================
+
+def populate(conn, chats, seed, default_times):
+    """Insert chats with a mix of default and custom platform/reminder settings."""
+    rng = random.Random(seed)
+    platforms = ("Codeforces", "LeetCode", "AtCoder", "CodeChef")
+    chat_rows, platform_rows, reminder_rows = [], [], []
+    for i in range(1, chats + 1):
+        # About one chat in five is a group.
+        chat_id = -i if rng.random() < 0.2 else i
+        chat_rows.append((chat_id,))
+        if rng.random() < 0.5:
+            picked = rng.sample(platforms, rng.randint(1, len(platforms)))
+            platform_rows.extend((chat_id, name) for name in picked)
+        if rng.random() < 0.5:
+            picked = rng.sample(default_times, rng.randint(1, len(default_times)))
+            reminder_rows.extend((chat_id, seconds) for seconds in picked)
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO chats VALUES (?)", chat_rows)
+        conn.executemany("INSERT OR IGNORE INTO chat_platforms VALUES (?, ?)", platform_rows)
+        conn.executemany("INSERT OR IGNORE INTO chat_reminders VALUES (?, ?)", reminder_rows)
+    return [row[0] for row in chat_rows]
+
+class WriteCounter:
+    """sqlite3 trace callback counting executed INSERT/UPDATE/DELETE statements."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, statement):
+        if statement.lstrip()[:6].upper() in ("INSERT", "UPDATE", "DELETE", "REPLAC"):
+            self.count += 1
+
+# ================= FAKE UPDATES =================
+
+class FakeMessage:
+    async def reply_text(self, text):
+        return None
+
+class FakeChat:
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+class FakeUpdate:
+    def __init__(self, chat_id):
+        self.effective_chat = FakeChat(chat_id)
+        self.message = FakeMessage()
+
+class FakeContext:
+    def __init__(self, args=(), job_queue=None, data=None):
+        self.args = list(args)
+        self.job_queue = job_queue
+        self.job = type("Job", (), {"data": data})()
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[int(round(q * (len(ordered) - 1)))]
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# ================= BENCHMARK =================
+
+class Benchmark:
+    def __init__(self, bot, server, args):
+        self.bot = bot
+        self.server = server
+        self.args = args
+        self.writes = WriteCounter()
+        self.phases = []
+        self.commands = {}
+        self.app = None
+        self.context = None
+        self.chat_ids = []
+
+    async def setup(self):
+        from telegram.ext import ApplicationBuilder, CallbackContext
+
+        bot = self.bot
+        bot.db.open()
+        self.chat_ids = bot.db.run_sync(
+            populate, self.args.chats, self.args.seed, bot.DEFAULT_REMINDER_TIMES
+        )
+        bot.db.run_sync(lambda conn: conn.set_trace_callback(self.writes))
+        self.app = ApplicationBuilder().token(BENCH_TOKEN).base_url(bot.TELEGRAM_API_URL).build()
+        await self.app.initialize()
+        started = time.perf_counter()
+        await bot.post_init(self.app)
+        self.record("startup (chats + snapshots)", started, 0, 0)
+        self.context = CallbackContext(self.app)
+
+    async def teardown(self):
+        await self.bot.post_shutdown(self.app)
+        await self.app.shutdown()
+
+    def record(self, name, started, writes_before, sends_before):
+        duration = time.perf_counter() - started
+        sends = self.server.sends - sends_before
+        self.phases.append({
+            "phase": name,
+            "seconds": round(duration, 4),
+            "sends": sends,
+            "sends_per_second": round(sends / duration, 1) if sends else 0,
+            "db_writes": self.writes.count - writes_before,
+        })
+
+    async def measure(self, name, fn, drain=False):
+        writes, sends = self.writes.count, self.server.sends
+        started = time.perf_counter()
+        await fn()
+        self.record(name, started, writes, sends)
+        if drain:
+            writes, sends = self.writes.count, self.server.sends
+            started = time.perf_counter()
+            await self.drain()
+            self.record(f"  send {name}", started, writes, sends)
+
+    async def drain(self):
+        """Wait until every queued notification has been sent and settled."""
+        deadline = time.monotonic() + self.args.drain_timeout
+        while time.monotonic() < deadline:
+            row = await self.bot.db.fetchone("SELECT COUNT(*) FROM outbox WHERE delivered_at IS NULL")
+            if not row[0] and not self.bot.dispatcher.depth():
+                return
+            await asyncio.sleep(0.05)
+        raise TimeoutError(f"outbox not drained within {self.args.drain_timeout} s")
+
+    async def tick(self):
+        # Make every platform due as if its polling interval had elapsed.
+        for source in self.bot.contest_cache.sources.values():
+            source.next_due = 0.0
+        await self.bot.check_contests(self.context)
+
+    def check_coverage(self):
+        """Fail if a platform yielded no upcoming contests from its fixture."""
+        missing = [
+            name for name in self.bot.PLATFORMS
+            if not self.bot.contest_index.columns.get(name, (None, []))[1]
+        ]
+        if missing:
+            raise RuntimeError(f"no upcoming contests parsed for: {', '.join(missing)}")
+
+    def change_codeforces(self):
+        """Reschedule one upcoming Codeforces round and publish a new one."""
+        contests = self.server.payloads["codeforces"]["result"]
+        upcoming = [c for c in contests if c["phase"] == "BEFORE"]
+        upcoming[-1]["startTimeSeconds"] += 3600
+        newest = dict(upcoming[0])
+        newest["id"] += 1
+        newest["name"] = "Codeforces Round (benchmark)"
+        newest["startTimeSeconds"] += 86400
+        contests.insert(0, newest)
+        self.server.publish("codeforces")
+
+    async def reminders(self):
+        bot = self.bot
+        now = time.time()
+        for contests in bot.contest_index.columns.values():
+            upcoming = [c for c in contests[1] if c["start"] > now]
+            if not upcoming:
+                continue
+            for offset in sorted(bot.subscriptions.offsets()):
+                await bot.send_reminder(FakeContext(data=(upcoming[0], offset)))
+
+    async def broadcast(self):
+        await self.bot.broadcast(self.app, "📢 Benchmark broadcast")
+
+    async def run_commands(self):
+        bot = self.bot
+        rng = random.Random(self.args.seed)
+        handlers = {
+            "upcoming": (bot.upcoming, ["5"]),
+            "next": (bot.next_contest, []),
+            "recent": (bot.recent, ["5"]),
+            "platform": (bot.platform, []),
+            "reminders": (bot.reminders, []),
+        }
+        latencies = {name: [] for name in handlers}
+        for _ in range(self.args.commands):
+            name = rng.choice(list(handlers))
+            handler, args = handlers[name]
+            update = FakeUpdate(rng.choice(self.chat_ids))
+            started = time.perf_counter()
+            await handler(update, FakeContext(args, self.app.job_queue))
+            latencies[name].append(time.perf_counter() - started)
+        for name, values in latencies.items():
+            if values:
+                self.commands[name] = {
+                    "count": len(values),
+                    "p50_ms": round(percentile(values, 0.5) * 1000, 3),
+                    "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+                }
+
+    async def run(self):
+        await self.setup()
+        try:
+            await self.measure("tick (cold start)", self.tick, drain=True)
+            self.check_coverage()
+            await self.measure("tick (unchanged)", self.tick)
+            self.change_codeforces()
+            await self.measure("tick (1 new, 1 rescheduled)", self.tick, drain=True)
+            await self.measure("reminder fan-out", self.reminders, drain=True)
+            await self.measure("broadcast", self.broadcast, drain=True)
+            writes = self.writes.count
+            started = time.perf_counter()
+            await self.run_commands()
+            self.record(f"{self.args.commands} commands", started, writes, self.server.sends)
+        finally:
+            await self.teardown()
+
+    def report(self):
+        return {
+            "chats": self.args.chats,
+            "subscribed": len(self.bot.subscriptions),
+            "phases": self.phases,
+            "commands": self.commands,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+def print_report(report):
+    print(f"\n{report['chats']} chats ({report['subscribed']} subscribed)\n")
+    print(f"{'phase':<34}{'seconds':>10}{'sends':>10}{'sends/s':>10}{'db writes':>11}")
+    for phase in report["phases"]:
+        print(
+            f"{phase['phase']:<34}{phase['seconds']:>10.3f}{phase['sends']:>10}"
+            f"{phase['sends_per_second']:>10.1f}{phase['db_writes']:>11}"
+        )
+    print(f"\n{'command':<34}{'count':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, stats in report["commands"].items():
+        print(f"{name:<34}{stats['count']:>10}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+    rss = report["peak_rss_mb"]
+    print(f"\npeak RSS: {rss:.1f} MB" if rss is not None else "\npeak RSS: unknown")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--chats", type=int, default=10000, help="synthetic chats to subscribe")
+    parser.add_argument("--commands", type=int, default=2000, help="command invocations to time")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the synthetic population")
+    parser.add_argument("--send-rate", type=float, default=5000,
+                        help="SEND_RATE for the run; the stand-in API has no flood limit")
+    parser.add_argument("--drain-timeout", type=float,
+                        help="seconds to wait for the outbox to empty after each phase "
+                             "(default: 900, or 0.2 s per chat if that is longer)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own logs")
+    args = parser.parse_args()
+    if args.drain_timeout is None:
+        # Each chat gets about 15 reminders in the fan-out phase, and the
+        # stand-in API handles a few hundred sends per second.
+        args.drain_timeout = max(900, args.chats * 0.2)
+
+    server = StandInServer(load_fixtures())
+    server.start()
+    workdir = tempfile.mkdtemp(prefix="contest-bot-bench-")
+    os.environ.update({
+        "BOT_TOKEN": BENCH_TOKEN,
+        "DB_PATH": os.path.join(workdir, "bench.db"),
+        "TELEGRAM_API_URL": f"{server.url}/bot",
+        "CODEFORCES_API_URL": f"{server.url}/codeforces",
+        "LEETCODE_API_URL": f"{server.url}/leetcode",
+        "ATCODER_API_URL": f"{server.url}/atcoder",
+        "CODECHEF_API_URL": f"{server.url}/codechef",
+        "SEND_RATE": str(args.send_rate),
+        # The stand-in API has no per-chat limit either; with Telegram's
+        # spacing every synthetic chat's dozen messages would set the pace.
+        "PRIVATE_CHAT_INTERVAL": "0",
+        "GROUP_CHAT_INTERVAL": "0",
+        "BOT_ROLE": "all",
+        "SENDER_PROCESSES": "0",
+    })
+    # bot.py reads its configuration at import time.
+    bot = importlib.import_module("bot")
+    if not args.verbose:
+        logging.getLogger("bot").setLevel(logging.WARNING)
+        logging.getLogger("apscheduler").setLevel(logging.WARNING)
+
+    benchmark = Benchmark(bot, server, args)
+    try:
+        asyncio.run(benchmark.run())
+    finally:
+        server.stop()
+        bot.db.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+    report = benchmark.report()
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,43 @@
 import os
 import logging
-import requests
 import sqlite3
 import datetime
+import hashlib
+import json
+import re
 import asyncio
+import bisect
+import collections
+import concurrent.futures
+import cProfile
+import contextlib
+import functools
+import heapq
+import io
+import itertools
+import math
+import pstats
+import signal
+import socket
+import subprocess
+import sys
+import time
+from array import array
+from urllib.parse import urlsplit
 from zoneinfo import ZoneInfo
-from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, MessageHandler, filters
+import httpx
+from telegram import Bot, Update
+from telegram.error import BadRequest, ChatMigrated, Forbidden, NetworkError, RetryAfter
+from telegram.ext import (
+    ApplicationBuilder, BaseUpdateProcessor, CommandHandler, ContextTypes, MessageHandler, filters,
+)
+from telegram.request import HTTPXRequest
+
+# orjson is optional; it only speeds up decoding of the smaller payloads.
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Get token from environment variable (required for production)
 TOKEN = os.getenv("BOT_TOKEN")
@@ -14,6 +45,7 @@ if not TOKEN:
     raise ValueError("BOT_TOKEN environment variable is not set! Get your token from @BotFather")
 
 BD_TZ = ZoneInfo("Asia/Dhaka")
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org/bot")
 
 # Configure logging with more detail for production
 logging.basicConfig(
@@ -21,72 +53,908 @@ logging.basicConfig(
     level=logging.INFO
 )
 logger = logging.getLogger(__name__)
+# httpx logs every request at INFO, which drowns out the bot's own logs.
+logging.getLogger("httpx").setLevel(logging.WARNING)
 
-# ================= DATABASE =================
-conn = sqlite3.connect("database.db", check_same_thread=False)
-cursor = conn.cursor()
+# ================= METRICS =================
 
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chats (
-    chat_id INTEGER PRIMARY KEY
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS contests (
-    id TEXT PRIMARY KEY,
-    name TEXT,
-    start_time INTEGER,
-    platform TEXT
-)
-""")
-
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS reminders (
-    contest_id TEXT,
-    reminder_seconds INTEGER,
-    chat_id INTEGER,
-    PRIMARY KEY (contest_id, reminder_seconds, chat_id)
-)
-""")
+# Port of the Prometheus text-format metrics endpoint; 0 disables it.
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+class Metrics:
+    """Counters, latency histograms and gauges rendered in the Prometheus text format.
+
+    Updates are plain dict operations, cheap enough for the hot paths, and
+    safe to make from the database thread as well as the event loop.
+    """
+
+    def __init__(self):
+        # (name, labels) -> value
+        self.counters = {}
+        # (name, labels) -> [count per bucket..., +Inf count, sum]
+        self.histograms = {}
+        # (name, labels) -> callable returning the current value
+        self.gauges = {}
+        self.descriptions = {}
+        # While a profile is captured: (name, labels) -> [calls, total, max]
+        self.trace = None
+
+    def describe(self, name, kind, description):
+        self.descriptions[name] = (kind, description)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        values = self.histograms.get(key)
+        if values is None:
+            values = self.histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        values[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        values[-1] += seconds
+        trace = self.trace
+        if trace is not None:
+            entry = trace.setdefault(key, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    @contextlib.contextmanager
+    def time(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def gauge(self, name, read, **labels):
+        self.gauges[(name, tuple(sorted(labels.items())))] = read
 
-cursor.execute("""
-CREATE TABLE IF NOT EXISTS chat_settings (
-    chat_id INTEGER PRIMARY KEY,
-    platforms TEXT,
-    reminder_times TEXT
+    def render(self):
+        lines = []
+        described = set()
+
+        def header(name):
+            if name not in described and name in self.descriptions:
+                described.add(name)
+                kind, description = self.descriptions[name]
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in sorted(list(self.counters.items())):
+            header(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), read in sorted(list(self.gauges.items()), key=lambda item: item[0]):
+            header(name)
+            try:
+                value = read()
+            except Exception:
+                continue
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        for (name, labels), values in sorted(list(self.histograms.items())):
+            header(name)
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), values):
+                cumulative += count
+                bucket_labels = format_labels(labels + (("le", bound),))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {values[-1]}")
+            lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+metrics = Metrics()
+metrics.describe("bot_fetch_seconds", "histogram", "Time to fetch one platform's contest list.")
+metrics.describe("bot_fetch_failures_total", "counter", "Failed platform fetches.")
+metrics.describe(
+    "bot_check_phase_seconds", "histogram", "Time spent in each phase of a contest check."
 )
-""")
-
-# Migrate reminders table if it was created without chat_id.
-cursor.execute("PRAGMA table_info(reminders)")
-reminder_columns = [row[1] for row in cursor.fetchall()]
-if "chat_id" not in reminder_columns:
-    cursor.execute("DROP TABLE IF EXISTS reminders")
-    cursor.execute("""
-    CREATE TABLE reminders (
+metrics.describe("bot_db_seconds", "histogram", "Time of each call on the database thread.")
+metrics.describe("bot_handler_seconds", "histogram", "Command and message handler latency.")
+metrics.describe("bot_send_seconds", "histogram", "Time to deliver one message, including retries.")
+metrics.describe("bot_messages_total", "counter", "Messages handed to Telegram, by outcome.")
+metrics.describe("bot_subscribed_chats", "gauge", "Chats currently subscribed.")
+metrics.describe("bot_pending_reminders", "gauge", "Reminder jobs scheduled but not yet fired.")
+metrics.describe("bot_send_queue_depth", "gauge", "Messages waiting in the send queue.")
+metrics.describe("bot_source_age_seconds", "gauge", "Age of each platform's last good snapshot.")
+metrics.describe("bot_source_failures", "gauge", "Consecutive fetch failures per platform.")
+
+async def serve_metrics(reader, writer):
+    try:
+        # The request itself doesn't matter; read up to the end of its headers.
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        body = metrics.render().encode()
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: close\r\n\r\n" + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+async def start_metrics_server(port):
+    """Serve /metrics on METRICS_HOST:port; returns the server, or None if disabled."""
+    if not port:
+        return None
+    server = await asyncio.start_server(serve_metrics, METRICS_HOST, port)
+    logger.info("Serving metrics on %s:%d", METRICS_HOST, port)
+    return server
+
+# ================= PROFILING =================
+
+# Comma-separated Telegram user ids allowed to use operator commands.
+ADMIN_IDS = {int(x) for x in os.getenv("ADMIN_IDS", "").replace(",", " ").split() if x.isdigit()}
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Contest checks profiled after SIGUSR1.
+PROFILE_SIGNAL_TICKS = 3
+
+class Profiler:
+    """Profiles the next few contest checks or handler calls on request.
+
+    Each capture records CPU time per function with cProfile and wall time
+    per phase from the metrics timers that fire meanwhile (fetch per
+    platform, database calls, rendering, sends), then writes a timestamped
+    .prof file and a readable .txt summary to PROFILE_DIR. One capture runs
+    at a time; other tasks that run while it awaits appear in the CPU
+    profile too, as they share the event loop thread. A capture the profiled
+    code marks idle (a contest check with nothing due) is dropped and not
+    counted.
+    """
+
+    def __init__(self):
+        # "tick" or "handler" -> captures still wanted
+        self.remaining = {"tick": 0, "handler": 0}
+        self.notify_chat = None
+        self.active = False
+
+    def request(self, kind, count, notify_chat=None):
+        self.remaining[kind] = count
+        self.notify_chat = notify_chat
+
+    @contextlib.contextmanager
+    def capture(self, kind, name):
+        capture = ProfileCapture()
+        if self.active or self.remaining[kind] <= 0:
+            yield capture
+            return
+        self.remaining[kind] -= 1
+        self.active = True
+        phases = metrics.trace = {}
+        profile = cProfile.Profile(time.process_time)
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield capture
+        finally:
+            profile.disable()
+            wall = time.perf_counter() - started
+            metrics.trace = None
+            self.active = False
+            if capture.idle:
+                self.remaining[kind] += 1
+                return
+            try:
+                self._write(kind, name, profile, phases, wall)
+            except Exception:
+                logger.exception("Failed to write the %s profile", name)
+
+    def _write(self, kind, name, profile, phases, wall):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        base = os.path.join(PROFILE_DIR, f"{stamp}-{kind}-{name}")
+        profile.dump_stats(base + ".prof")
+        summary = format_phase_summary(name, phases, wall)
+        stats = io.StringIO()
+        pstats.Stats(profile, stream=stats).sort_stats("cumulative").print_stats(40)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(summary + "\n\nCPU time by function:\n" + stats.getvalue())
+        logger.info("Wrote profile %s.prof (%.3f s wall)", base, wall)
+        if self.notify_chat is not None and not any(self.remaining.values()):
+            chat_id, self.notify_chat = self.notify_chat, None
+            # Queued from the event loop thread; the send itself is durable.
+            asyncio.get_running_loop().create_task(notify_profile(chat_id, summary, base))
+
+class ProfileCapture:
+    """Yielded by Profiler.capture; set idle to discard the capture."""
+
+    __slots__ = ("idle",)
+
+    def __init__(self):
+        self.idle = False
+
+def format_phase_summary(name, phases, wall):
+    lines = [f"{name}: {wall:.3f} s wall", f"{'phase':<52}{'calls':>7}{'total s':>10}{'max s':>9}"]
+    for (metric, labels), (calls, total, longest) in sorted(
+        phases.items(), key=lambda item: -item[1][1]
+    ):
+        label = metric + format_labels(labels)
+        lines.append(f"{label:<52}{calls:>7}{total:>10.3f}{longest:>9.3f}")
+    return "\n".join(lines)
+
+async def notify_profile(chat_id, summary, base):
+    text = f"Profile written to {base}.prof\n\n{summary}"[:MAX_MESSAGE_LENGTH]
+    await db.run(queue_broadcast, [chat_id], text)
+    outbox.notify()
+
+profiler = Profiler()
+
+def request_profile_from_signal(signum, frame):
+    profiler.request("tick", PROFILE_SIGNAL_TICKS)
+    logger.info("Profiling the next %d contest checks", PROFILE_SIGNAL_TICKS)
+
+def instrumented(handler):
+    """Wrap an update handler so its latency is recorded and it can be profiled."""
+    @functools.wraps(handler)
+    async def wrapper(update, context):
+        with metrics.time("bot_handler_seconds", handler=handler.__name__):
+            with profiler.capture("handler", handler.__name__):
+                return await handler(update, context)
+    return wrapper
+
+# ================= DATABASE =================
+DB_PATH = os.getenv("DB_PATH", "database.db")
+
+class Database:
+    """Owns the SQLite connection on one dedicated thread.
+
+    Every statement runs on that thread with its own cursor, so a slow fsync
+    never blocks the event loop and concurrent handlers never interleave on a
+    shared cursor. Callers await the query helpers or hand a function to run().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = None
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sqlite"
+        )
+
+    def open(self):
+        """Connect and apply pending schema migrations; called once at startup."""
+        self._executor.submit(self._connect).result()
+        self.run_sync(migrate_schema)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, cached_statements=256)
+        # WAL lets readers run alongside the writer and turns each commit into
+        # an append instead of a rollback-journal rewrite; NORMAL sync only
+        # fsyncs at checkpoints, which is safe in WAL mode.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-16000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA busy_timeout=5000")
+        self.conn = conn
+
+    def _call(self, fn, args):
+        with metrics.time("bot_db_seconds", call=fn.__name__):
+            return fn(self.conn, *args)
+
+    def run_sync(self, fn, *args):
+        """Run fn(conn, *args) on the database thread and block until it returns."""
+        return self._executor.submit(self._call, fn, args).result()
+
+    async def run(self, fn, *args):
+        """Run fn(conn, *args) on the database thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._call, fn, args)
+
+    async def fetchone(self, sql, params=()):
+        def fetchone(conn):
+            return conn.execute(sql, params).fetchone()
+        return await self.run(fetchone)
+
+    async def fetchall(self, sql, params=()):
+        def fetchall(conn):
+            return conn.execute(sql, params).fetchall()
+        return await self.run(fetchall)
+
+    async def execute(self, sql, params=()):
+        def execute(conn):
+            with conn:
+                conn.execute(sql, params)
+        await self.run(execute)
+
+    def close(self):
+        def close(conn):
+            conn.close()
+        self.run_sync(close)
+        self._executor.shutdown()
+
+def create_schema(conn):
+    """Baseline schema; also upgrades every layout used before versioned migrations."""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS chats (
+        chat_id INTEGER PRIMARY KEY
+    )
+    """)
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS contests (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        start_time INTEGER,
+        platform TEXT
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_contests_start ON contests (start_time)")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS reminders (
         contest_id TEXT,
         reminder_seconds INTEGER,
         chat_id INTEGER,
         PRIMARY KEY (contest_id, reminder_seconds, chat_id)
     )
     """)
-conn.commit()
 
-# ================= FETCHERS =================
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS chat_platforms (
+        chat_id INTEGER,
+        platform TEXT,
+        PRIMARY KEY (chat_id, platform)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_platforms_platform ON chat_platforms (platform, chat_id)")
+
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS chat_reminders (
+        chat_id INTEGER,
+        seconds INTEGER,
+        PRIMARY KEY (chat_id, seconds)
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_reminders_seconds ON chat_reminders (seconds, chat_id)")
+
+    # Notifications waiting to be sent; a sender claims rows by setting a lease.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS outbox (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        text TEXT NOT NULL,
+        available_at REAL NOT NULL,
+        lease_owner TEXT,
+        lease_until REAL NOT NULL DEFAULT 0,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        delivered_at REAL,
+        error TEXT
+    )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_outbox_pending ON outbox (available_at, chat_id) "
+        "WHERE delivered_at IS NULL"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_outbox_chat ON outbox (chat_id) WHERE delivered_at IS NULL"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_outbox_lease ON outbox (lease_owner, lease_until)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_outbox_delivered ON outbox (delivered_at) "
+        "WHERE delivered_at IS NOT NULL"
+    )
+
+    # Chats dropped (new_chat_id NULL) or migrated by a sender, replayed by
+    # every process that keeps chats in memory.
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS chat_changes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id INTEGER NOT NULL,
+        new_chat_id INTEGER
+    )
+    """)
+
+    # Migrate the old comma-joined chat_settings table into the normalized tables.
+    has_chat_settings = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='chat_settings'"
+    ).fetchone()
+    if has_chat_settings:
+        for chat_id, platforms_value, reminders_value in conn.execute(
+            "SELECT chat_id, platforms, reminder_times FROM chat_settings"
+        ).fetchall():
+            conn.executemany(
+                "INSERT OR IGNORE INTO chat_platforms VALUES (?, ?)",
+                [(chat_id, p) for p in (platforms_value or "").split(",") if p],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO chat_reminders VALUES (?, ?)",
+                [(chat_id, int(x)) for x in (reminders_value or "").split(",") if x.isdigit()],
+            )
+        conn.execute("DROP TABLE chat_settings")
+
+    # Migrate reminders table if it was created without chat_id.
+    reminder_columns = [row[1] for row in conn.execute("PRAGMA table_info(reminders)")]
+    if "chat_id" not in reminder_columns:
+        conn.execute("DROP TABLE IF EXISTS reminders")
+        conn.execute("""
+        CREATE TABLE reminders (
+            contest_id TEXT,
+            reminder_seconds INTEGER,
+            chat_id INTEGER,
+            PRIMARY KEY (contest_id, reminder_seconds, chat_id)
+        )
+        """)
+
+def add_source_snapshots(conn):
+    # Last good contest list of each platform, loaded at startup so commands
+    # can answer before the first fetch completes.
+    conn.execute("""
+    CREATE TABLE source_snapshots (
+        platform TEXT PRIMARY KEY,
+        contests TEXT NOT NULL,
+        fetched_at REAL NOT NULL
+    )
+    """)
 
-def fetch_codeforces():
-    url = "https://codeforces.com/api/contest.list"
+# Applied in order; a database's PRAGMA user_version is the number applied.
+# Append new migrations, never edit or reorder released ones.
+SCHEMA_MIGRATIONS = [
+    create_schema,
+    add_source_snapshots,
+]
+
+def migrate_schema(conn):
+    if conn.execute("PRAGMA user_version").fetchone()[0] == len(SCHEMA_MIGRATIONS):
+        return
+    # Take the write lock before re-reading the version so processes starting
+    # together apply each migration once.
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        response = requests.get(url, timeout=15)
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+            logger.info("Migrating database to schema version %d (%s)", number, migration.__name__)
+            migration(conn)
+            conn.execute(f"PRAGMA user_version={number}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+db = Database(DB_PATH)
+
+# Hot statements are kept as constants so sqlite3's statement cache reuses the
+# prepared statement on every call.
+SQL_STORED_CONTESTS = "SELECT id, start_time FROM contests WHERE id IN ({})"
+SQL_UPSERT_CONTEST = (
+    "INSERT INTO contests (id, name, start_time, platform) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT(id) DO UPDATE SET name=excluded.name, "
+    "start_time=excluded.start_time, platform=excluded.platform"
+)
+SQL_SENT_REMINDERS = "SELECT chat_id FROM reminders WHERE contest_id=? AND reminder_seconds=?"
+SQL_INSERT_REMINDER = "INSERT OR IGNORE INTO reminders VALUES (?, ?, ?)"
+# Forgets reminders of a rescheduled contest whose new fire time is still ahead.
+SQL_RESET_REMINDERS = "DELETE FROM reminders WHERE contest_id=? AND reminder_seconds<?"
+SQL_ENQUEUE_MESSAGE = "INSERT INTO outbox (chat_id, text, available_at) VALUES (?, ?, ?)"
+# Claims the due rows of the chats with the oldest due rows, so one chat's
+# notifications are sent together by whichever process wins the claim. Chats
+# with rows still leased elsewhere are skipped, so only one process sends to a
+# chat at a time and its spacing holds. Fresh rows still inside their digest
+# window are pulled in early; rows held back after a failed send wait out
+# their retry delay.
+SQL_CLAIM_OUTBOX = """
+UPDATE outbox SET lease_owner=?, lease_until=?
+WHERE delivered_at IS NULL AND lease_until<=?
+AND (available_at<=? OR (attempts=0 AND available_at<=?)) AND chat_id IN (
+    SELECT chat_id FROM outbox
+    WHERE delivered_at IS NULL AND available_at<=? AND lease_until<=?
+    AND chat_id NOT IN (
+        SELECT chat_id FROM outbox WHERE delivered_at IS NULL AND lease_until>?
+    )
+    GROUP BY chat_id ORDER BY MIN(id) LIMIT ?
+)
+"""
+SQL_CLAIMED_OUTBOX = (
+    "SELECT id, chat_id, text, attempts FROM outbox "
+    "WHERE lease_owner=? AND lease_until=? AND delivered_at IS NULL ORDER BY id"
+)
+SQL_OUTBOX_DELIVERED = "UPDATE outbox SET delivered_at=? WHERE id=?"
+SQL_OUTBOX_RETRY = (
+    "UPDATE outbox SET lease_owner=NULL, lease_until=0, attempts=attempts+1, "
+    "available_at=? WHERE id=?"
+)
+SQL_OUTBOX_FAILED = "UPDATE outbox SET delivered_at=?, error=? WHERE id=?"
+SQL_PRUNE_REMINDERS = (
+    "DELETE FROM reminders WHERE rowid IN (SELECT r.rowid FROM contests c "
+    "JOIN reminders r ON r.contest_id = c.id WHERE c.start_time < ? LIMIT ?)"
+)
+SQL_PRUNE_CONTESTS = (
+    "DELETE FROM contests WHERE rowid IN (SELECT rowid FROM contests WHERE start_time < ? "
+    "AND NOT EXISTS (SELECT 1 FROM reminders WHERE contest_id = contests.id) LIMIT ?)"
+)
+SQL_PRUNE_OUTBOX = (
+    "DELETE FROM outbox WHERE id IN (SELECT id FROM outbox WHERE delivered_at < ? LIMIT ?)"
+)
+SQL_TRIM_CHAT_CHANGES = (
+    "DELETE FROM chat_changes WHERE id <= (SELECT MAX(id) FROM chat_changes) - ?"
+)
+
+# SQLite's default limit on host parameters in one statement is 999.
+SQL_BATCH_SIZE = 500
+
+def enqueue_messages(conn, messages, available_at):
+    """Add (chat_id, text) pairs to the outbox inside the caller's transaction."""
+    conn.executemany(
+        SQL_ENQUEUE_MESSAGE, [(chat_id, text, available_at) for chat_id, text in messages]
+    )
+
+def store_contests(conn, contests, announcements=None, available_at=0):
+    """Upsert contests and queue announcements for new ones in one transaction.
+
+    announcements maps a contest id to (text, chat_ids); only contests that
+    were not stored before are announced. Reminders already sent for a moved
+    contest are cleared for the offsets that now fire in the future, so they
+    are sent again at the new time. Returns the ids that were not stored
+    before and the ids whose stored start time differs from the new one.
+    """
+    ids = [contest["id"] for contest in contests]
+    stored = {}
+    for i in range(0, len(ids), SQL_BATCH_SIZE):
+        batch = ids[i:i + SQL_BATCH_SIZE]
+        rows = conn.execute(
+            SQL_STORED_CONTESTS.format(",".join("?" * len(batch))), batch
+        ).fetchall()
+        stored.update(rows)
+    new_ids = [c["id"] for c in contests if c["id"] not in stored]
+    moved = [c for c in contests if c["id"] in stored and stored[c["id"]] != c["start"]]
+    now = time.time()
+    with conn:
+        conn.executemany(
+            SQL_UPSERT_CONTEST,
+            [(c["id"], c["name"], c["start"], c["platform"]) for c in contests],
+        )
+        conn.executemany(SQL_RESET_REMINDERS, [(c["id"], c["start"] - now) for c in moved])
+        for contest_id in new_ids:
+            if announcements and contest_id in announcements:
+                text, chat_ids = announcements[contest_id]
+                enqueue_messages(conn, ((chat_id, text) for chat_id in chat_ids), available_at)
+    return new_ids, [c["id"] for c in moved]
+
+def record_reminders(conn, contest_id, offset, chat_ids, text, available_at=0):
+    """Add chats to the reminder ledger and queue the reminder for them.
+
+    Both happen in one transaction, so a reminder is either recorded and
+    queued or neither. Returns the chats that had not been reminded before.
+    """
+    sent = {row[0] for row in conn.execute(SQL_SENT_REMINDERS, (contest_id, offset))}
+    pending = [chat_id for chat_id in chat_ids if chat_id not in sent]
+    if pending:
+        with conn:
+            conn.executemany(
+                SQL_INSERT_REMINDER,
+                [(contest_id, offset, chat_id) for chat_id in pending],
+            )
+            enqueue_messages(conn, ((chat_id, text) for chat_id in pending), available_at)
+    return pending
+
+def queue_broadcast(conn, chat_ids, text):
+    with conn:
+        enqueue_messages(conn, ((chat_id, text) for chat_id in chat_ids), 0)
+
+def claim_outbox(conn, owner, now, lease_until, max_chats, digest_until):
+    """Lease the due rows of up to max_chats chats and return them.
+
+    Unsent rows due by digest_until are claimed along with a chat's due rows.
+    """
+    with conn:
+        conn.execute(
+            SQL_CLAIM_OUTBOX,
+            (owner, lease_until, now, now, digest_until, now, now, now, max_chats),
+        )
+        return conn.execute(SQL_CLAIMED_OUTBOX, (owner, lease_until)).fetchall()
+
+def settle_outbox(conn, delivered, retried, failed):
+    """Record send outcomes: delivered (at, id), retried (available_at, id), failed (at, error, id)."""
+    with conn:
+        conn.executemany(SQL_OUTBOX_DELIVERED, delivered)
+        conn.executemany(SQL_OUTBOX_RETRY, retried)
+        conn.executemany(SQL_OUTBOX_FAILED, failed)
+
+def deactivate_chat(conn, chat_id):
+    """Forget a chat the bot can no longer write to and drop its queued messages."""
+    with conn:
+        conn.execute("DELETE FROM chats WHERE chat_id=?", (chat_id,))
+        conn.execute("DELETE FROM chat_platforms WHERE chat_id=?", (chat_id,))
+        conn.execute("DELETE FROM chat_reminders WHERE chat_id=?", (chat_id,))
+        conn.execute(
+            "UPDATE outbox SET delivered_at=?, error='gone' "
+            "WHERE chat_id=? AND delivered_at IS NULL",
+            (time.time(), chat_id),
+        )
+        conn.execute("INSERT INTO chat_changes (chat_id) VALUES (?)", (chat_id,))
+
+def migrate_chat(conn, chat_id, new_chat_id):
+    """Move a group's subscription, settings and queued messages to its supergroup id."""
+    with conn:
+        for table in ("chats", "chat_platforms", "chat_reminders", "reminders"):
+            conn.execute(
+                f"UPDATE OR IGNORE {table} SET chat_id=? WHERE chat_id=?", (new_chat_id, chat_id)
+            )
+            conn.execute(f"DELETE FROM {table} WHERE chat_id=?", (chat_id,))
+        conn.execute(
+            "UPDATE outbox SET chat_id=? WHERE chat_id=? AND delivered_at IS NULL",
+            (new_chat_id, chat_id),
+        )
+        conn.execute(
+            "INSERT INTO chat_changes (chat_id, new_chat_id) VALUES (?, ?)", (chat_id, new_chat_id)
+        )
+
+def prune_expired(conn, cutoff, limit):
+    """Delete one batch of contests, reminder rows and sent messages older than cutoff.
+
+    A contest is only deleted once its reminder rows are gone. Returns the
+    number of rows deleted, so callers repeat until it reaches 0.
+    """
+    with conn:
+        deleted = conn.execute(SQL_PRUNE_REMINDERS, (cutoff, limit)).rowcount
+        deleted += conn.execute(SQL_PRUNE_CONTESTS, (cutoff, limit)).rowcount
+        deleted += conn.execute(SQL_PRUNE_OUTBOX, (cutoff, limit)).rowcount
+    return deleted
+
+def compact_database(conn, keep_chat_changes):
+    """Trim chat_changes, give free pages back to the OS and refresh query statistics."""
+    with conn:
+        conn.execute(SQL_TRIM_CHAT_CHANGES, (keep_chat_changes,))
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        # Databases created before incremental mode need one full VACUUM for
+        # the setting to take effect.
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+    # Sample at most 1000 rows per index so ANALYZE stays cheap on big tables.
+    conn.execute("PRAGMA analysis_limit=1000")
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+def save_snapshot(conn, platform_name, contests_json, fetched_at):
+    """Store a platform's snapshot, or only its fetch time when contests_json is None."""
+    with conn:
+        if contests_json is None:
+            conn.execute(
+                "UPDATE source_snapshots SET fetched_at=? WHERE platform=?",
+                (fetched_at, platform_name),
+            )
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO source_snapshots VALUES (?, ?, ?)",
+                (platform_name, contests_json, fetched_at),
+            )
+
+def load_snapshots(conn):
+    return conn.execute("SELECT platform, contests, fetched_at FROM source_snapshots").fetchall()
+
+def release_outbox_leases(conn, owner):
+    """Hand undelivered rows leased by owner back to the other senders."""
+    with conn:
+        conn.execute(
+            "UPDATE outbox SET lease_owner=NULL, lease_until=0 "
+            "WHERE lease_owner=? AND delivered_at IS NULL",
+            (owner,),
+        )
+
+def subscribe_chat(conn, chat_id):
+    with conn:
+        conn.execute("INSERT OR IGNORE INTO chats VALUES (?)", (chat_id,))
+
+def insert_chats(conn, chat_ids):
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO chats VALUES (?)", [(c,) for c in chat_ids])
+
+def unsubscribe_chat(conn, chat_id):
+    with conn:
+        conn.execute("DELETE FROM chats WHERE chat_id=?", (chat_id,))
+
+# ================= HTTP =================
+
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+# Keep idle connections around longer than the polling interval so the next
+# tick reuses them instead of paying for a fresh TLS handshake.
+HTTP_KEEPALIVE_EXPIRY = 330
+
+def json_loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+_json_decoder = json.JSONDecoder()
+
+async def iter_json_array(chunks, key=None):
+    """Yield the elements of a JSON array as its text arrives in chunks.
+
+    Only the undecoded tail of the body is buffered, so memory stays flat however
+    long the array is. If the array can't be located (an unexpected layout such
+    as an error object), the whole body is decoded instead.
+    """
+    if key is None:
+        start_pattern = re.compile(r"\s*\[")
+        find_start = start_pattern.match
+    else:
+        start_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        find_start = start_pattern.search
+    buffer = ""
+    pos = 0
+    started = False
+    async for chunk in chunks:
+        buffer += chunk
+        if not started:
+            match = find_start(buffer)
+            if match is None:
+                continue
+            pos = match.end()
+            started = True
+        length = len(buffer)
+        while True:
+            while pos < length and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= length:
+                break
+            if buffer[pos] == "]":
+                return
+            try:
+                item, pos = _json_decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element is cut off at the end of this chunk.
+                break
+            yield item
+        buffer = buffer[pos:]
+        pos = 0
+    if started:
+        raise ValueError("JSON array ended before its closing bracket")
+    data = json_loads(buffer)
+    items = data.get(key) if key is not None and isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ValueError("Response does not contain a JSON array")
+    for item in items:
+        yield item
+
+class HttpClient:
+    """Pooled async HTTP client shared by all fetchers.
+
+    One keep-alive connection pool serves every platform, concurrent requests
+    are capped per host, and GETs are revalidated with ETag / If-Modified-Since
+    so an unchanged source comes back as a cheap 304.
+    """
+
+    def __init__(self, timeout, per_host_limit):
+        self.timeout = timeout
+        self.per_host_limit = per_host_limit
+        self._client = None
+        self._host_limits = {}
+        # url -> (etag, last_modified, decoded body) of the last 200 response
+        self._validators = {}
+
+    def _get_client(self):
+        # Created lazily so the client binds to the running event loop.
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.per_host_limit * 4,
+                    max_keepalive_connections=self.per_host_limit * 4,
+                    keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+                ),
+                headers={"User-Agent": "Mozilla/5.0"},
+                follow_redirects=True,
+            )
+        return self._client
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        limit = self._host_limits.get(host)
+        if limit is None:
+            limit = self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return limit
+
+    def _conditional_headers(self, url):
+        headers = {}
+        cached = self._validators.get(url)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def _remember(self, url, response, value):
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._validators[url] = (etag, last_modified, value)
+        else:
+            self._validators.pop(url, None)
+
+    async def get_json(self, url):
+        headers = self._conditional_headers(url)
+        async with self._host_limit(url):
+            response = await self._get_client().get(url, headers=headers)
+        if response.status_code == 304 and url in self._validators:
+            return self._validators[url][2]
+        response.raise_for_status()
+        data = json_loads(response.content)
+        self._remember(url, response, data)
+        return data
+
+    async def get_json_items(self, url, key=None, keep=None, until=None):
+        """Stream a JSON array and return only the elements keep() accepts.
+
+        The array is the body itself, or the value of the top-level key. Parsing
+        stops at the first element for which until() is true, and only the kept
+        elements are cached for conditional requests, never the whole document.
+        The rest of the body is still read so the connection can be reused.
+        """
+        headers = self._conditional_headers(url)
+        async with self._host_limit(url):
+            async with self._get_client().stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and url in self._validators:
+                    return self._validators[url][2]
+                response.raise_for_status()
+                items = []
+                chunks = response.aiter_text()
+                stream = iter_json_array(chunks, key)
+                try:
+                    async for item in stream:
+                        if until is not None and until(item):
+                            break
+                        if keep is None or keep(item):
+                            items.append(item)
+                finally:
+                    await stream.aclose()
+                # httpx closes a connection whose body wasn't read to the end
+                # instead of returning it to the pool.
+                async for _ in chunks:
+                    pass
+        self._remember(url, response, items)
+        return items
+
+    async def post_json(self, url, payload):
+        async with self._host_limit(url):
+            response = await self._get_client().post(url, json=payload)
         response.raise_for_status()
-        data = response.json()
+        return json_loads(response.content)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+http_client = HttpClient(HTTP_TIMEOUT, HTTP_PER_HOST_LIMIT)
+
+# ================= FETCHERS =================
+
+# Platform endpoints can be pointed elsewhere, e.g. at the stand-in servers of
+# benchmark.py.
+CODEFORCES_API_URL = os.getenv("CODEFORCES_API_URL", "https://codeforces.com/api/contest.list")
+LEETCODE_API_URL = os.getenv("LEETCODE_API_URL", "https://leetcode.com/graphql")
+ATCODER_API_URL = os.getenv(
+    "ATCODER_API_URL", "https://kenkoooo.com/atcoder/resources/contests.json"
+)
+CODECHEF_API_URL = os.getenv(
+    "CODECHEF_API_URL", "https://www.codechef.com/api/list/contests/all"
+)
+
+async def fetch_codeforces():
+    url = CODEFORCES_API_URL
+    try:
+        # contest.list puts the BEFORE-phase contests first, so stop parsing at
+        # the first contest that has already started.
+        data = await http_client.get_json_items(
+            url, key="result", until=lambda c: c.get("phase") != "BEFORE"
+        )
     except Exception as exc:
         logger.warning("Codeforces fetch failed: %s", exc)
-        return []
+        return None
 
     contests = []
-    for c in data.get("result", []):
+    for c in data:
         if c.get("phase") == "BEFORE":
             contests.append({
                 "id": f"cf_{c['id']}",
@@ -97,8 +965,8 @@ def fetch_codeforces():
             })
     return [c for c in contests if c.get("start")]
 
-def fetch_leetcode():
-    url = "https://leetcode.com/graphql"
+async def fetch_leetcode():
+    url = LEETCODE_API_URL
     query = {
         "query": """
         {
@@ -111,12 +979,10 @@ def fetch_leetcode():
         """
     }
     try:
-        response = requests.post(url, json=query, timeout=15)
-        response.raise_for_status()
-        res = response.json()
+        res = await http_client.post_json(url, query)
     except Exception as exc:
         logger.warning("LeetCode fetch failed: %s", exc)
-        return []
+        return None
 
     contests = []
     now = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
@@ -133,18 +999,20 @@ def fetch_leetcode():
             })
     return contests
 
-def fetch_atcoder():
-    url = "https://kenkoooo.com/atcoder/resources/contests.json"
+async def fetch_atcoder():
+    url = ATCODER_API_URL
+    now = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
     try:
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()
-        data = response.json()
+        # The full list holds every past contest; keep only future ones while
+        # streaming instead of decoding the whole document.
+        data = await http_client.get_json_items(
+            url, keep=lambda c: (c.get("start_epoch_second") or 0) > now
+        )
     except Exception as exc:
         logger.warning("AtCoder fetch failed: %s", exc)
-        return []
+        return None
 
     contests = []
-    now = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
     for c in data:
         start_time = c.get("start_epoch_second")
         if start_time and start_time > now:
@@ -158,15 +1026,13 @@ def fetch_atcoder():
             })
     return contests
 
-def fetch_codechef():
-    url = "https://www.codechef.com/api/list/contests/all"
+async def fetch_codechef():
+    url = CODECHEF_API_URL
     try:
-        response = requests.get(url, timeout=15, headers={"User-Agent": "Mozilla/5.0"})
-        response.raise_for_status()
-        data = response.json()
+        data = await http_client.get_json(url)
     except Exception as exc:
         logger.warning("CodeChef fetch failed: %s", exc)
-        return []
+        return None
 
     contests = []
     now = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
@@ -175,10 +1041,10 @@ def fetch_codechef():
         start_time_str = c.get("contest_start_date")
         if start_time_str:
             try:
-                # CodeChef returns timestamps in milliseconds-like format or ISO
-                start_time = int(c.get("contest_start_date_iso", 0))
-                if start_time == 0:
+                start_iso = c.get("contest_start_date_iso")
+                if not start_iso:
                     continue
+                start_time = int(datetime.datetime.fromisoformat(start_iso).timestamp())
                 if start_time > now:
                     contest_code = c.get("contest_code", "")
                     contests.append({
@@ -192,76 +1058,433 @@ def fetch_codechef():
                 continue
     return contests
 
+# ================= CONTEST CACHE =================
+
+# Each platform is polled on its own schedule: CONTEST_CACHE_TTL seconds to
+# start with, shrinking towards SOURCE_MIN_INTERVAL while the source keeps
+# changing or a contest is about to start, and growing towards
+# SOURCE_MAX_INTERVAL while it stays the same. A command only waits for a
+# fetch when a source has no snapshot yet or it is older than
+# CONTEST_CACHE_STALE_TTL.
+CONTEST_CACHE_TTL = int(os.getenv("CONTEST_CACHE_TTL", "300"))
+CONTEST_CACHE_STALE_TTL = int(os.getenv("CONTEST_CACHE_STALE_TTL", "3600"))
+SOURCE_MIN_INTERVAL = int(os.getenv("SOURCE_MIN_INTERVAL", "60"))
+SOURCE_MAX_INTERVAL = int(os.getenv("SOURCE_MAX_INTERVAL", "1800"))
+# After this many consecutive failures the circuit opens: the source is only
+# retried on its backoff schedule and commands stop waiting for it.
+SOURCE_FAILURE_THRESHOLD = 3
+SOURCE_MAX_BACKOFF = 3600
+# How often check_contests wakes up to refresh whichever sources are due.
+CHECK_INTERVAL = 30
+
+FETCHERS = {
+    "Codeforces": fetch_codeforces,
+    "LeetCode": fetch_leetcode,
+    "AtCoder": fetch_atcoder,
+    "CodeChef": fetch_codechef,
+}
+
+class ContestSource:
+    """One platform's last good snapshot plus its polling interval and circuit breaker."""
+
+    def __init__(self, platform_name, fetch):
+        self.platform = platform_name
+        self.fetch = fetch
+        self.contests = None
+        # Wall-clock time of the last good snapshot, for reporting its age.
+        self.fetched_at = None
+        self.interval = CONTEST_CACHE_TTL
+        self.next_due = 0.0
+        self.failures = 0
+        self._digest = None
+        self._refresh_task = None
+
+    def age(self):
+        return time.time() - self.fetched_at if self.fetched_at is not None else None
+
+    def is_due(self):
+        return time.monotonic() >= self.next_due
+
+    def circuit_open(self):
+        return self.failures >= SOURCE_FAILURE_THRESHOLD
+
+    async def refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._do_refresh())
+        # Shield the shared task so a cancelled caller doesn't cancel the refresh
+        # for everyone else waiting on it.
+        await asyncio.shield(self._refresh_task)
+
+    async def _do_refresh(self):
+        try:
+            with metrics.time("bot_fetch_seconds", platform=self.platform):
+                contests = await self.fetch()
+        except Exception as exc:
+            logger.warning("%s fetch failed: %s", self.platform, exc)
+            contests = None
+        if contests is None:
+            metrics.inc("bot_fetch_failures_total", platform=self.platform)
+            self._record_failure()
+            return
+        changed = self._record_success(contests)
+        try:
+            await db.run(
+                save_snapshot, self.platform, json.dumps(contests) if changed else None,
+                self.fetched_at,
+            )
+        except Exception as exc:
+            logger.warning("Failed to save the %s snapshot: %s", self.platform, exc)
+
+    def _record_success(self, contests):
+        digest = snapshot_digest(contests)
+        if self.circuit_open():
+            logger.info("%s recovered after %d failures", self.platform, self.failures)
+        if self._digest is None:
+            interval = self.interval
+        elif digest != self._digest:
+            interval = self.interval / 2
+        else:
+            interval = self.interval * 1.5
+        # Poll faster as the next contest approaches so a late reschedule is
+        # caught before its reminders go out.
+        now = time.time()
+        starts = [c["start"] for c in contests if c["start"] > now]
+        if starts:
+            interval = min(interval, (min(starts) - now) / 2)
+        self.interval = max(SOURCE_MIN_INTERVAL, min(SOURCE_MAX_INTERVAL, interval))
+        if digest != self._digest:
+            contest_index.rebuild(self.platform, contests)
+        changed = digest != self._digest
+        self.contests = contests
+        self.fetched_at = now
+        self.failures = 0
+        self._digest = digest
+        self.next_due = time.monotonic() + self.interval
+        return changed
+
+    def restore(self, contests, fetched_at):
+        """Serve a snapshot saved by a previous run until the next poll replaces it."""
+        contest_index.rebuild(self.platform, contests)
+        self.contests = contests
+        self.fetched_at = fetched_at
+        self._digest = snapshot_digest(contests)
+        # Poll again once the snapshot is as old as the polling interval.
+        self.next_due = time.monotonic() + max(0.0, self.interval - self.age())
+
+    def _record_failure(self):
+        self.failures += 1
+        backoff = min(SOURCE_MAX_BACKOFF, SOURCE_MIN_INTERVAL * 2 ** self.failures)
+        if self.failures == SOURCE_FAILURE_THRESHOLD:
+            logger.warning(
+                "%s failed %d times in a row; serving its last snapshot until it recovers (next retry in %d s)",
+                self.platform, self.failures, backoff,
+            )
+        self.next_due = time.monotonic() + backoff
+
+class ContestIndex:
+    """Contests kept sorted by start time in one column per platform.
+
+    Each column is a parallel pair of an array of start times and the contests
+    in the same order, so /next is a bisect per wanted platform and /upcoming
+    and /recent are a k-way merge of the wanted columns that stops after n.
+    """
+
+    def __init__(self):
+        # platform -> (array of start times, contests sorted by start time)
+        self.columns = {}
+        # Bumped on every change so derived caches know when to drop entries.
+        self.version = 0
+
+    def rebuild(self, platform_name, contests):
+        ordered = sorted(contests, key=lambda c: c["start"])
+        self.columns[platform_name] = (array("q", [c["start"] for c in ordered]), ordered)
+        self.version += 1
+
+    def _columns(self, platform_mask):
+        for platform_name, column in self.columns.items():
+            if platform_mask & PLATFORM_BITS[platform_name]:
+                yield column
+
+    def next(self, platform_mask, now):
+        best = None
+        for starts, contests in self._columns(platform_mask):
+            i = bisect.bisect_right(starts, now)
+            if i < len(starts) and (best is None or starts[i] < best["start"]):
+                best = contests[i]
+        return best
+
+    def upcoming(self, platform_mask, now, limit):
+        runs = []
+        for starts, contests in self._columns(platform_mask):
+            i = bisect.bisect_right(starts, now)
+            runs.append(itertools.islice(contests, i, None))
+        return list(itertools.islice(heapq.merge(*runs, key=lambda c: c["start"]), limit))
+
+    def recent(self, platform_mask, limit):
+        runs = [reversed(contests) for _, contests in self._columns(platform_mask)]
+        merged = heapq.merge(*runs, key=lambda c: c["start"], reverse=True)
+        return list(itertools.islice(merged, limit))
+
+contest_index = ContestIndex()
+
+class ContestCache:
+    """In-process contest snapshots shared by commands and the check_contests job.
+
+    Every platform is a ContestSource with its own refresh schedule. Commands
+    read the last good snapshots and only wait for a source that has nothing
+    usable yet; a failing source keeps serving its last snapshot until it
+    recovers.
+    """
+
+    def __init__(self, fetchers):
+        self.sources = {name: ContestSource(name, fetch) for name, fetch in fetchers.items()}
+
+    @property
+    def contests(self):
+        return [c for source in self.sources.values() for c in (source.contests or [])]
+
+    async def restore(self):
+        """Load the snapshots saved by the previous run; returns how many contests were restored."""
+        restored = 0
+        for platform_name, contests_json, fetched_at in await db.run(load_snapshots):
+            source = self.sources.get(platform_name)
+            if source is None or source.contests is not None:
+                continue
+            contests = json_loads(contests_json)
+            source.restore(contests, fetched_at)
+            restored += len(contests)
+        return restored
+
+    async def ensure_fresh(self):
+        """Wait only for sources with no usable snapshot; revalidate the rest in the background."""
+        waiting = []
+        for source in self.sources.values():
+            if source.circuit_open():
+                continue
+            age = source.age()
+            if age is None or age > CONTEST_CACHE_STALE_TTL:
+                waiting.append(source.refresh())
+            elif source.is_due():
+                # Stale-while-revalidate: answer now, refresh in the background.
+                asyncio.create_task(source.refresh())
+        if waiting:
+            await asyncio.gather(*waiting)
+
+    async def refresh_due(self):
+        """Refresh every source whose polling interval has elapsed."""
+        due = [source for source in self.sources.values() if source.is_due()]
+        await asyncio.gather(*(source.refresh() for source in due))
+        return due
+
+    def stale_notice(self, settings):
+        """Describe wanted platforms that are currently served from an old snapshot."""
+        notes = []
+        for source in self.sources.values():
+            if not settings.wants(source.platform) or source.failures == 0:
+                continue
+            age = source.age()
+            if age is None:
+                notes.append(f"⚠️ {source.platform} is currently unavailable.")
+            else:
+                notes.append(
+                    f"⚠️ {source.platform} is unavailable; showing data from {int(age // 60)} min ago."
+                )
+        return "\n".join(notes)
+
+class ContestDiff:
+    """What changed in one platform's snapshot since it was last processed."""
+
+    __slots__ = ("platform", "digest", "contests", "added", "removed", "rescheduled", "updated")
+
+    def __init__(self, platform, digest, contests):
+        self.platform = platform
+        self.digest = digest
+        self.contests = contests
+        self.added = []
+        self.removed = []
+        self.rescheduled = []
+        self.updated = []
+
+def snapshot_digest(contests):
+    digest = hashlib.blake2b(digest_size=16)
+    for c in sorted(contests, key=lambda c: c["id"]):
+        digest.update(repr((c["id"], c["name"], c["start"], c["url"])).encode())
+    return digest.digest()
+
+class SnapshotTracker:
+    """Remembers the last processed snapshot of each platform and diffs new ones against it.
+
+    An unchanged snapshot hashes to the same digest and produces no diff, so
+    check_contests skips the platform entirely.
+    """
+
+    def __init__(self):
+        self.digests = {}
+        # platform -> contest id -> contest
+        self.known = {}
+
+    def diff(self, platform_name, contests):
+        digest = snapshot_digest(contests)
+        if self.digests.get(platform_name) == digest:
+            return None
+        previous = self.known.get(platform_name, {})
+        current = {c["id"]: c for c in contests}
+        diff = ContestDiff(platform_name, digest, current)
+        for contest_id, contest in current.items():
+            old = previous.get(contest_id)
+            if old is None:
+                diff.added.append(contest)
+            elif old["start"] != contest["start"]:
+                diff.rescheduled.append(contest)
+            elif old["name"] != contest["name"] or old["url"] != contest["url"]:
+                diff.updated.append(contest)
+        diff.removed = [c for contest_id, c in previous.items() if contest_id not in current]
+        return diff
+
+    def apply(self, diff):
+        self.digests[diff.platform] = diff.digest
+        self.known[diff.platform] = diff.contests
+
+snapshot_tracker = SnapshotTracker()
+
+contest_cache = ContestCache(FETCHERS)
+
+# ================= RENDERING =================
+
+class RenderCache:
+    """Memoized message text for contest notifications and command responses.
+
+    Each contest's text is formatted once however many chats receive it, and
+    whole /upcoming, /next and /recent responses are reused per (command,
+    platform mask, limit) until the contest index changes or the first contest
+    in the response starts.
+    """
+
+    def __init__(self):
+        self.version = None
+        # (id, name, start, url) -> contest block with the localized start time
+        self.fragments = {}
+        # (kind, contest key, extra) -> notification text
+        self.notifications = {}
+        # (command, platform mask, limit) -> (text, expires_at)
+        self.responses = {}
+
+    def _check_version(self):
+        if self.version != contest_index.version:
+            self.fragments.clear()
+            self.notifications.clear()
+            self.responses.clear()
+            self.version = contest_index.version
+
+    def contest(self, contest):
+        self._check_version()
+        key = (contest["id"], contest["name"], contest["start"], contest["url"])
+        text = self.fragments.get(key)
+        if text is None:
+            start_time = datetime.datetime.fromtimestamp(
+                contest["start"], tz=BD_TZ
+            ).strftime("%Y-%m-%d %H:%M %Z")
+            text = self.fragments[key] = (
+                f"{contest['name']}\n"
+                f"Platform: {contest['platform']}\n"
+                f"Start: {start_time}\n"
+                f"{contest['url']}"
+            )
+        return text
+
+    def new_contest(self, contest):
+        self._check_version()
+        key = ("new", contest["id"], contest["name"], contest["url"])
+        text = self.notifications.get(key)
+        if text is None:
+            text = self.notifications[key] = (
+                "🆕 New Contest Published!\n\n"
+                f"{contest['name']}\n"
+                f"Platform: {contest['platform']}\n"
+                f"{contest['url']}"
+            )
+        return text
+
+    def reminder(self, contest, offset):
+        self._check_version()
+        key = ("reminder", contest["id"], contest["name"], contest["url"], offset)
+        text = self.notifications.get(key)
+        if text is None:
+            time_str = str(datetime.timedelta(seconds=offset))
+            text = self.notifications[key] = (
+                f"⏰ Reminder ({time_str} left)\n\n"
+                f"{contest['name']}\n"
+                f"Platform: {contest['platform']}\n"
+                f"{contest['url']}"
+            )
+        return text
+
+    def response(self, key, query, expires=True):
+        """Return the rendered contest list for key, or None if it is empty.
+
+        query(now) returns the contests to render. With expires, the entry is
+        rebuilt once the first contest in it has started.
+        """
+        self._check_version()
+        now = time.time()
+        entry = self.responses.get(key)
+        if entry is not None and now < entry[1]:
+            return entry[0]
+        contests = query(now)
+        text = "\n\n".join(self.contest(c) for c in contests) if contests else None
+        expires_at = contests[0]["start"] if expires and contests else math.inf
+        self.responses[key] = (text, expires_at)
+        return text
+
+render_cache = RenderCache()
+
 # ================= BOT COMMANDS =================
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    cursor.execute("INSERT OR IGNORE INTO chats VALUES (?)", (chat_id,))
-    cursor.execute(
-        "INSERT OR IGNORE INTO chat_settings VALUES (?, ?, ?)",
-        (chat_id, "Codeforces,LeetCode,AtCoder,CodeChef", ",".join(str(x) for x in DEFAULT_REMINDER_TIMES)),
-    )
-    conn.commit()
+    await db.run(subscribe_chat, chat_id)
+    new_chats.discard(chat_id)
+    subscriptions.add(chat_id, settings_store.get(chat_id))
+    reschedule_reminders(context.job_queue)
     await update.message.reply_text("✅ Subscribed to Contest Reminders!")
 
 async def stop(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    cursor.execute("DELETE FROM chats WHERE chat_id=?", (chat_id,))
-    cursor.execute("DELETE FROM chat_settings WHERE chat_id=?", (chat_id,))
-    conn.commit()
+    new_chats.discard(chat_id)
+    await db.run(unsubscribe_chat, chat_id)
+    await settings_store.delete(chat_id)
+    subscriptions.remove(chat_id)
     await update.message.reply_text("❌ Unsubscribed!")
 
 async def upcoming(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    settings = load_chat_settings(chat_id)
+    settings = settings_store.get(chat_id)
     limit = 5
     if context.args and context.args[0].isdigit():
         limit = max(1, min(10, int(context.args[0])))
 
-    codeforces_task = asyncio.to_thread(fetch_codeforces)
-    leetcode_task = asyncio.to_thread(fetch_leetcode)
-    atcoder_task = asyncio.to_thread(fetch_atcoder)
-    codechef_task = asyncio.to_thread(fetch_codechef)
-    codeforces, leetcode, atcoder, codechef = await asyncio.gather(
-        codeforces_task, leetcode_task, atcoder_task, codechef_task
+    await contest_cache.ensure_fresh()
+    mask = settings.platform_mask
+    text = render_cache.response(
+        ("upcoming", mask, limit), lambda now: contest_index.upcoming(mask, now, limit)
+    )
+    notice = contest_cache.stale_notice(settings)
+    await update.message.reply_text(
+        "\n\n".join(filter(None, [text or "No upcoming contests found for your filters.", notice]))
     )
-    all_contests = [
-        c for c in (codeforces + leetcode + atcoder + codechef)
-        if c["platform"] in settings["platforms"]
-    ]
-    all_contests.sort(key=lambda c: c["start"])
-    upcoming_contests = all_contests[:limit]
-
-    if not upcoming_contests:
-        await update.message.reply_text("No upcoming contests found for your filters.")
-        return
-
-    lines = []
-    for contest in upcoming_contests:
-        start_time = datetime.datetime.fromtimestamp(
-            contest["start"], tz=BD_TZ
-        ).strftime("%Y-%m-%d %H:%M %Z")
-        lines.append(
-            f"{contest['name']}\n"
-            f"Platform: {contest['platform']}\n"
-            f"Start: {start_time}\n"
-            f"{contest['url']}"
-        )
-
-    await update.message.reply_text("\n\n".join(lines))
 
 async def platform(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     if not context.args:
-        settings = load_chat_settings(chat_id)
+        settings = settings_store.get(chat_id)
         await update.message.reply_text(
-            "Platforms enabled: " + ", ".join(settings["platforms"]) + "\n"
+            "Platforms enabled: " + ", ".join(settings.platforms) + "\n"
             "Usage: /platform all | /platform cf lc ac cc"
         )
         return
 
     if context.args[0].lower() == "all":
-        platforms = ["Codeforces", "LeetCode", "AtCoder", "CodeChef"]
+        platforms = list(PLATFORMS)
     else:
         platforms = []
         for token in context.args:
@@ -276,16 +1499,16 @@ async def platform(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-    settings = load_chat_settings(chat_id)
-    save_chat_settings(chat_id, platforms, settings["reminders"])
+    settings = settings_store.get(chat_id)
+    await settings_store.save(chat_id, platforms, settings.reminders)
     await update.message.reply_text("Platforms updated: " + ", ".join(platforms))
 
 async def reminders(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
     if not context.args:
-        settings = load_chat_settings(chat_id)
+        settings = settings_store.get(chat_id)
         await update.message.reply_text(
-            "Reminder times: " + format_reminder_list(settings["reminders"]) + "\n"
+            "Reminder times: " + format_reminder_list(settings.reminders) + "\n"
             "Usage: /reminders 1d 2h 1h 30m 10m 5m"
         )
         return
@@ -297,8 +1520,9 @@ async def reminders(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
-    settings = load_chat_settings(chat_id)
-    save_chat_settings(chat_id, settings["platforms"], reminder_list)
+    settings = settings_store.get(chat_id)
+    await settings_store.save(chat_id, settings.platforms, reminder_list)
+    reschedule_reminders(context.job_queue)
     await update.message.reply_text(
         "Reminder times updated: " + format_reminder_list(reminder_list)
     )
@@ -316,85 +1540,405 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Platforms: Codeforces (cf), LeetCode (lc), AtCoder (ac), CodeChef (cc)"
     )
 
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/profile [checks|commands] [n] - operator-only; ignored for everyone else."""
+    user = update.effective_user
+    if user is None or user.id not in ADMIN_IDS:
+        return
+    kind, count = "tick", 1
+    for arg in context.args or []:
+        if arg.isdigit():
+            count = max(1, min(20, int(arg)))
+        elif arg.lower().startswith("command"):
+            kind = "handler"
+        elif arg.lower().startswith("check"):
+            kind = "tick"
+    profiler.request(kind, count, update.effective_chat.id)
+    target = "contest checks" if kind == "tick" else "command/message handlers"
+    await update.message.reply_text(
+        f"Profiling the next {count} {target}; results go to {PROFILE_DIR}/."
+    )
+
 async def next_contest(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    settings = load_chat_settings(chat_id)
-
-    codeforces_task = asyncio.to_thread(fetch_codeforces)
-    leetcode_task = asyncio.to_thread(fetch_leetcode)
-    atcoder_task = asyncio.to_thread(fetch_atcoder)
-    codechef_task = asyncio.to_thread(fetch_codechef)
-    codeforces, leetcode, atcoder, codechef = await asyncio.gather(
-        codeforces_task, leetcode_task, atcoder_task, codechef_task
-    )
-    all_contests = [
-        c for c in (codeforces + leetcode + atcoder + codechef)
-        if c["platform"] in settings["platforms"]
-    ]
-    if not all_contests:
-        await update.message.reply_text("No upcoming contests found for your filters.")
-        return
+    settings = settings_store.get(chat_id)
 
-    contest = min(all_contests, key=lambda c: c["start"])
-    start_time = datetime.datetime.fromtimestamp(
-        contest["start"], tz=BD_TZ
-    ).strftime("%Y-%m-%d %H:%M %Z")
+    await contest_cache.ensure_fresh()
+    mask = settings.platform_mask
+    text = render_cache.response(
+        ("next", mask, 1), lambda now: list(filter(None, [contest_index.next(mask, now)]))
+    )
+    notice = contest_cache.stale_notice(settings)
     await update.message.reply_text(
-        f"{contest['name']}\n"
-        f"Platform: {contest['platform']}\n"
-        f"Start: {start_time}\n"
-        f"{contest['url']}"
+        "\n\n".join(filter(None, [text or "No upcoming contests found for your filters.", notice]))
     )
 
 async def recent(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
-    settings = load_chat_settings(chat_id)
+    settings = settings_store.get(chat_id)
     limit = 5
     if context.args and context.args[0].isdigit():
         limit = max(1, min(10, int(context.args[0])))
 
-    codeforces_task = asyncio.to_thread(fetch_codeforces)
-    leetcode_task = asyncio.to_thread(fetch_leetcode)
-    atcoder_task = asyncio.to_thread(fetch_atcoder)
-    codechef_task = asyncio.to_thread(fetch_codechef)
-    codeforces, leetcode, atcoder, codechef = await asyncio.gather(
-        codeforces_task, leetcode_task, atcoder_task, codechef_task
+    await contest_cache.ensure_fresh()
+    mask = settings.platform_mask
+    text = render_cache.response(
+        ("recent", mask, limit), lambda now: contest_index.recent(mask, limit), expires=False
+    )
+    notice = contest_cache.stale_notice(settings)
+    await update.message.reply_text(
+        "\n\n".join(filter(None, [text or "No contests found for your filters.", notice]))
     )
-    all_contests = [
-        c for c in (codeforces + leetcode + atcoder + codechef)
-        if c["platform"] in settings["platforms"]
-    ]
-    if not all_contests:
-        await update.message.reply_text("No contests found for your filters.")
-        return
-
-    all_contests.sort(key=lambda c: c["start"], reverse=True)
-    recent_contests = all_contests[:limit]
-
-    lines = []
-    for contest in recent_contests:
-        start_time = datetime.datetime.fromtimestamp(
-            contest["start"], tz=BD_TZ
-        ).strftime("%Y-%m-%d %H:%M %Z")
-        lines.append(
-            f"{contest['name']}\n"
-            f"Platform: {contest['platform']}\n"
-            f"Start: {start_time}\n"
-            f"{contest['url']}"
-        )
-
-    await update.message.reply_text("\n\n".join(lines))
 
 async def auto_subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.effective_chat or not update.message:
         return
     chat_id = update.effective_chat.id
-    cursor.execute("INSERT OR IGNORE INTO chats VALUES (?)", (chat_id,))
-    cursor.execute(
-        "INSERT OR IGNORE INTO chat_settings VALUES (?, ?, ?)",
-        (chat_id, "Codeforces,LeetCode,AtCoder,CodeChef", ",".join(str(x) for x in DEFAULT_REMINDER_TIMES)),
-    )
-    conn.commit()
+    # Busy groups hit this on every message; chats we already know cost a set
+    # lookup, and new ones are written to SQLite in batches by flush_new_chats.
+    if chat_id in subscriptions:
+        return
+    subscriptions.add(chat_id, settings_store.get(chat_id))
+    new_chats.add(chat_id)
+    reschedule_reminders(context.job_queue)
+
+# ================= DISPATCHER =================
+
+# Telegram allows about 30 messages per second overall, one per second to the
+# same chat and 20 per minute to the same group.
+SEND_RATE = float(os.getenv("SEND_RATE", "30"))
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "8"))
+SEND_QUEUE_SIZE = int(os.getenv("SEND_QUEUE_SIZE", "10000"))
+SEND_MAX_ATTEMPTS = 5
+# Minimum seconds between two messages to the same private chat or group.
+PRIVATE_CHAT_INTERVAL = float(os.getenv("PRIVATE_CHAT_INTERVAL", "1"))
+GROUP_CHAT_INTERVAL = float(os.getenv("GROUP_CHAT_INTERVAL", "3"))
+# BadRequest descriptions meaning the chat is gone for good rather than the
+# message being malformed.
+CHAT_GONE_ERRORS = ("chat not found", "user not found", "peer_id_invalid", "user is deactivated")
+# How long a chat found gone is remembered, so that messages queued for it
+# before then are dropped without calling Telegram.
+GONE_CHAT_SECONDS = 600
+# Seconds a new notification waits in the outbox so others for the same chat
+# can join its digest; 0 sends one message per notification.
+DIGEST_WINDOW = float(os.getenv("DIGEST_WINDOW", "0"))
+MAX_MESSAGE_LENGTH = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖\n\n"
+# Chats claimed from the outbox per batch, and how long a claim is held before
+# another sender may take the rows over.
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "200"))
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+OUTBOX_POLL_INTERVAL = 1.0
+OUTBOX_BUSY_DELAY = 0.05
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_DELAY = 60
+
+class TokenBucket:
+    """Async token bucket that can be paused when Telegram asks us to back off."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class MessageDispatcher:
+    """Bounded send queue drained by a pool of workers within Telegram's flood limits.
+
+    A global token bucket caps the overall rate, each chat is spaced out by its
+    own minimum interval, and RetryAfter / network errors are retried instead
+    of dropping the message.
+    """
+
+    def __init__(self, rate, workers, queue_size):
+        self.bucket = TokenBucket(rate, capacity=rate)
+        self.workers = workers
+        self.queue_size = queue_size
+        self.queue = None
+        self.bot = None
+        self.sent = 0
+        self.failed = 0
+        self._tasks = []
+        self._chat_next = {}
+        # chat_id -> monotonic time it was found gone
+        self._gone = {}
+        self._recent_sends = collections.deque()
+
+    def start(self, bot):
+        self.bot = bot
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def send(self, chat_id, text, done=None):
+        """Queue a message, waiting for room if the queue is full.
+
+        done, if given, is called with "sent", "failed" or "retry" once the
+        message has been handled.
+        """
+        await self.queue.put((chat_id, text, done, time.monotonic()))
+
+    def depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def throughput(self):
+        """Messages per second delivered over the last minute."""
+        self._trim_recent(time.monotonic())
+        return len(self._recent_sends) / 60
+
+    async def _worker(self):
+        while True:
+            chat_id, text, done, queued_at = await self.queue.get()
+            status = "retry"
+            started = time.perf_counter()
+            try:
+                status = await self._deliver(chat_id, text, queued_at)
+            except Exception:
+                logger.exception("Unexpected error while sending to %s", chat_id)
+            finally:
+                metrics.observe("bot_send_seconds", time.perf_counter() - started)
+                metrics.inc("bot_messages_total", status=status)
+                self.queue.task_done()
+                if done is not None:
+                    done(status)
+
+    async def _deliver(self, chat_id, text, queued_at):
+        for attempt in range(1, SEND_MAX_ATTEMPTS + 1):
+            # Another worker may have found the chat gone while this message
+            # waited in the queue or for the chat's next slot.
+            if self._gone_since(chat_id, queued_at):
+                return "gone"
+            await self._wait_for_chat(chat_id)
+            if self._gone_since(chat_id, queued_at):
+                return "gone"
+            await self.bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+            except RetryAfter as exc:
+                logger.warning("Flood limit hit, pausing sends for %s s", exc.retry_after)
+                self.bucket.pause(exc.retry_after)
+            except ChatMigrated as exc:
+                logger.info("Chat %s migrated to %s", chat_id, exc.new_chat_id)
+                await db.run(migrate_chat, chat_id, exc.new_chat_id)
+                chat_id = exc.new_chat_id
+            except Forbidden as exc:
+                # Blocked by the user, kicked from the group or the group is gone.
+                logger.info("Dropping chat %s: %s", chat_id, exc)
+                await self._drop_chat(chat_id)
+                return "gone"
+            except BadRequest as exc:
+                # BadRequest subclasses NetworkError but retrying won't help.
+                if exc.message.lower().startswith(CHAT_GONE_ERRORS):
+                    logger.info("Dropping chat %s: %s", chat_id, exc)
+                    await self._drop_chat(chat_id)
+                    return "gone"
+                logger.warning("Failed to send message to %s: %s", chat_id, exc)
+                self.failed += 1
+                return "failed"
+            except NetworkError as exc:
+                logger.warning("Send to %s failed (attempt %d): %s", chat_id, attempt, exc)
+                await asyncio.sleep(min(30, 2 ** attempt))
+            except Exception as exc:
+                logger.warning("Failed to send message to %s: %s", chat_id, exc)
+                self.failed += 1
+                return "failed"
+            else:
+                self.sent += 1
+                now = time.monotonic()
+                self._recent_sends.append(now)
+                self._trim_recent(now)
+                return "sent"
+        logger.warning("Giving up on message to %s after %d attempts", chat_id, SEND_MAX_ATTEMPTS)
+        self.failed += 1
+        return "retry"
+
+    async def _drop_chat(self, chat_id):
+        now = time.monotonic()
+        if len(self._gone) > 10000:
+            self._gone = {k: v for k, v in self._gone.items() if v > now - GONE_CHAT_SECONDS}
+        self._gone[chat_id] = now
+        await db.run(deactivate_chat, chat_id)
+        self.failed += 1
+
+    def _gone_since(self, chat_id, queued_at):
+        """Whether the chat was found gone after this message was queued."""
+        found = self._gone.get(chat_id)
+        return found is not None and found >= queued_at
+
+    async def _wait_for_chat(self, chat_id):
+        # Reserve the chat's next slot before sleeping so concurrent workers
+        # sending to the same chat queue up behind each other.
+        now = time.monotonic()
+        interval = GROUP_CHAT_INTERVAL if chat_id < 0 else PRIVATE_CHAT_INTERVAL
+        slot = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = slot + interval
+        if len(self._chat_next) > 50000:
+            self._chat_next = {k: v for k, v in self._chat_next.items() if v > now}
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _trim_recent(self, now):
+        while self._recent_sends and self._recent_sends[0] < now - 60:
+            self._recent_sends.popleft()
+
+dispatcher = MessageDispatcher(SEND_RATE, SEND_WORKERS, SEND_QUEUE_SIZE)
+
+def build_digest(rows):
+    """Join (row id, text) pairs into as few messages as fit Telegram's length limit.
+
+    Each message of more than one update gets a header counting the updates it
+    holds. Returns (row ids, message) pairs.
+    """
+    # Room for the longest header any of the messages can get.
+    header_length = len(f"📬 {len(rows)} contest updates")
+    groups, group, length = [], [], header_length
+    for row_id, text in rows:
+        added = len(DIGEST_SEPARATOR) + len(text)
+        if group and length + added > MAX_MESSAGE_LENGTH:
+            groups.append(group)
+            group, length = [], header_length
+        group.append((row_id, text))
+        length += added
+    groups.append(group)
+    messages = []
+    for group in groups:
+        ids = [row_id for row_id, _ in group]
+        if len(group) == 1:
+            messages.append((ids, group[0][1]))
+        else:
+            body = DIGEST_SEPARATOR.join(text for _, text in group)
+            messages.append((ids, f"📬 {len(group)} contest updates{DIGEST_SEPARATOR}{body}"))
+    return messages
+
+class OutboxDrainer:
+    """Claims due outbox rows under a lease, sends them and records the outcome.
+
+    Any number of processes can drain the same database: a batch is claimed
+    by stamping lease_owner/lease_until in one UPDATE, and rows whose lease
+    ran out because their sender died become claimable again. A chat's
+    due rows are claimed together and, when DIGEST_WINDOW is set, sent as
+    one digest.
+    """
+
+    def __init__(self, batch_size, lease_seconds):
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        # ((row id, attempts) pairs, status) reported by the send workers
+        self.results = []
+        self._task = None
+        self._wakeup = None
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def notify(self):
+        """Wake the drain loop after rows were queued by this process."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def release(self):
+        """Record finished sends and give back leases on rows never sent."""
+        await self._settle()
+        await db.run(release_outbox_leases, self.owner)
+
+    async def _run(self):
+        while True:
+            claimed = 0
+            try:
+                await self._settle()
+                # Only claim what the workers can send well within the lease.
+                if dispatcher.depth() >= self.batch_size:
+                    await asyncio.sleep(OUTBOX_BUSY_DELAY)
+                    continue
+                claimed = await self._drain_once()
+            except Exception:
+                logger.exception("Failed to drain the outbox")
+            if not claimed:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _drain_once(self):
+        now = time.time()
+        rows = await db.run(
+            claim_outbox, self.owner, now, now + self.lease_seconds, self.batch_size,
+            now + DIGEST_WINDOW,
+        )
+        if DIGEST_WINDOW > 0:
+            by_chat = {}
+            attempts = {}
+            for row_id, chat_id, text, row_attempts in rows:
+                by_chat.setdefault(chat_id, []).append((row_id, text))
+                attempts[row_id] = row_attempts
+            messages = [
+                (chat_id, [(row_id, attempts[row_id]) for row_id in ids], message)
+                for chat_id, items in by_chat.items()
+                for ids, message in build_digest(items)
+            ]
+        else:
+            # Keep queue order, which interleaves chats, so the send workers
+            # aren't all held up by one chat's pacing.
+            messages = [
+                (chat_id, [(row_id, row_attempts)], text)
+                for row_id, chat_id, text, row_attempts in rows
+            ]
+        for chat_id, sent, message in messages:
+            await dispatcher.send(chat_id, message, done=functools.partial(self._done, sent))
+        return len(rows)
+
+    def _done(self, sent, status):
+        self.results.append((sent, status))
+
+    async def _settle(self):
+        if not self.results:
+            return
+        results, self.results = self.results, []
+        now = time.time()
+        delivered, retried, failed = [], [], []
+        for sent, status in results:
+            for row_id, attempts in sent:
+                if status == "sent":
+                    delivered.append((now, row_id))
+                elif status == "retry" and attempts + 1 < OUTBOX_MAX_ATTEMPTS:
+                    retried.append((now + OUTBOX_RETRY_DELAY * 2 ** attempts, row_id))
+                else:
+                    failed.append((now, status, row_id))
+        await db.run(settle_outbox, delivered, retried, failed)
+
+outbox = OutboxDrainer(OUTBOX_BATCH_SIZE, OUTBOX_LEASE_SECONDS)
 
 # ================= REMINDER SYSTEM =================
 
@@ -407,6 +1951,10 @@ DEFAULT_REMINDER_TIMES = [
     300     # 5 min
 ]
 
+PLATFORMS = ("Codeforces", "LeetCode", "AtCoder", "CodeChef")
+PLATFORM_BITS = {name: 1 << i for i, name in enumerate(PLATFORMS)}
+ALL_PLATFORMS_MASK = (1 << len(PLATFORMS)) - 1
+
 PLATFORM_MAP = {
     "cf": "Codeforces",
     "codeforces": "Codeforces",
@@ -443,152 +1991,643 @@ def parse_reminder_tokens(text):
     reminders = sorted(set(reminders), reverse=True)
     return [r for r in reminders if r > 0]
 
-def load_chat_settings(chat_id):
-    cursor.execute(
-        "SELECT platforms, reminder_times FROM chat_settings WHERE chat_id=?",
-        (chat_id,),
-    )
-    row = cursor.fetchone()
-    if not row:
-        return {
-            "platforms": ["Codeforces", "LeetCode", "AtCoder", "CodeChef"],
-            "reminders": DEFAULT_REMINDER_TIMES,
+class ChatSettings:
+    """A chat's platform filter as a bitmask over PLATFORMS plus its reminder offsets."""
+
+    __slots__ = ("platform_mask", "reminders")
+
+    def __init__(self, platform_mask, reminders):
+        self.platform_mask = platform_mask
+        self.reminders = reminders
+
+    @property
+    def platforms(self):
+        return [name for name in PLATFORMS if self.platform_mask & PLATFORM_BITS[name]]
+
+    def wants(self, platform_name):
+        return bool(self.platform_mask & PLATFORM_BITS.get(platform_name, 0))
+
+DEFAULT_SETTINGS = ChatSettings(ALL_PLATFORMS_MASK, tuple(DEFAULT_REMINDER_TIMES))
+
+def platforms_to_mask(platforms):
+    mask = 0
+    for name in platforms:
+        mask |= PLATFORM_BITS[name]
+    return mask
+
+def write_chat_settings(conn, chat_id, platforms, reminders):
+    with conn:
+        conn.execute("DELETE FROM chat_platforms WHERE chat_id=?", (chat_id,))
+        conn.execute("DELETE FROM chat_reminders WHERE chat_id=?", (chat_id,))
+        conn.executemany(
+            "INSERT INTO chat_platforms VALUES (?, ?)",
+            [(chat_id, name) for name in platforms],
+        )
+        conn.executemany(
+            "INSERT INTO chat_reminders VALUES (?, ?)",
+            [(chat_id, seconds) for seconds in reminders],
+        )
+
+def delete_chat_settings(conn, chat_id):
+    with conn:
+        conn.execute("DELETE FROM chat_platforms WHERE chat_id=?", (chat_id,))
+        conn.execute("DELETE FROM chat_reminders WHERE chat_id=?", (chat_id,))
+
+class SettingsStore:
+    """Write-through in-memory cache of every chat's settings.
+
+    Lookups never touch SQLite; saves go to the normalized chat_platforms and
+    chat_reminders tables first and then replace the cached record. Chats
+    without a stored row get DEFAULT_SETTINGS.
+    """
+
+    def __init__(self):
+        self.settings = {}
+
+    async def load(self):
+        def read_settings(conn):
+            return (
+                conn.execute("SELECT chat_id, platform FROM chat_platforms").fetchall(),
+                conn.execute(
+                    "SELECT chat_id, seconds FROM chat_reminders ORDER BY chat_id, seconds DESC"
+                ).fetchall(),
+            )
+        platform_rows, reminder_rows = await db.run(read_settings)
+        masks = {}
+        for chat_id, name in platform_rows:
+            masks[chat_id] = masks.get(chat_id, 0) | PLATFORM_BITS.get(name, 0)
+        reminders = {}
+        for chat_id, seconds in reminder_rows:
+            reminders.setdefault(chat_id, []).append(seconds)
+        self.settings = {
+            chat_id: ChatSettings(
+                masks.get(chat_id) or ALL_PLATFORMS_MASK,
+                tuple(reminders.get(chat_id) or DEFAULT_REMINDER_TIMES),
+            )
+            for chat_id in masks.keys() | reminders.keys()
         }
-    platforms = [p for p in (row[0] or "").split(",") if p]
-    reminders = [int(x) for x in (row[1] or "").split(",") if x.isdigit()]
-    if not platforms:
-        platforms = ["Codeforces", "LeetCode", "AtCoder", "CodeChef"]
-    if not reminders:
-        reminders = DEFAULT_REMINDER_TIMES
-    return {"platforms": platforms, "reminders": reminders}
-
-def save_chat_settings(chat_id, platforms, reminders):
-    platforms_value = ",".join(platforms)
-    reminders_value = ",".join(str(x) for x in reminders)
-    cursor.execute(
-        "INSERT OR REPLACE INTO chat_settings VALUES (?, ?, ?)",
-        (chat_id, platforms_value, reminders_value),
-    )
-    conn.commit()
+
+    def get(self, chat_id):
+        return self.settings.get(chat_id, DEFAULT_SETTINGS)
+
+    async def save(self, chat_id, platforms, reminders):
+        await db.run(write_chat_settings, chat_id, platforms, reminders)
+        settings = ChatSettings(platforms_to_mask(platforms), tuple(reminders))
+        self.settings[chat_id] = settings
+        subscriptions.update(chat_id, settings)
+        return settings
+
+    async def delete(self, chat_id):
+        await db.run(delete_chat_settings, chat_id)
+        self.settings.pop(chat_id, None)
+
+settings_store = SettingsStore()
+
+class SubscriptionIndex:
+    """In-memory platform -> reminder offset -> chat_ids index of subscribed chats.
+
+    Kept in sync by the command handlers and rebuilt from SQLite at startup, so
+    reminder fan-out reads the matching chats directly instead of scanning
+    every chat's settings.
+    """
+
+    def __init__(self):
+        # chat_id -> ChatSettings
+        self.chats = {}
+        # platform -> set of chat_ids
+        self.by_platform = {}
+        # platform -> offset -> set of chat_ids
+        self.by_offset = {}
+
+    def __contains__(self, chat_id):
+        return chat_id in self.chats
+
+    def __len__(self):
+        return len(self.chats)
+
+    async def load(self):
+        rows = await db.fetchall("SELECT chat_id FROM chats")
+        self.chats, self.by_platform, self.by_offset = {}, {}, {}
+        for (chat_id,) in rows:
+            self.add(chat_id, settings_store.get(chat_id))
+
+    def add(self, chat_id, settings):
+        self.remove(chat_id)
+        self.chats[chat_id] = settings
+        for platform_name in settings.platforms:
+            self.by_platform.setdefault(platform_name, set()).add(chat_id)
+            offsets = self.by_offset.setdefault(platform_name, {})
+            for offset in settings.reminders:
+                offsets.setdefault(offset, set()).add(chat_id)
+
+    def update(self, chat_id, settings):
+        """Apply new settings to a chat, if it is subscribed."""
+        if chat_id in self.chats:
+            self.add(chat_id, settings)
+
+    def remove(self, chat_id):
+        settings = self.chats.pop(chat_id, None)
+        if settings is None:
+            return
+        for platform_name in settings.platforms:
+            self.by_platform[platform_name].discard(chat_id)
+            offsets = self.by_offset[platform_name]
+            for offset in settings.reminders:
+                chat_ids = offsets[offset]
+                chat_ids.discard(chat_id)
+                if not chat_ids:
+                    del offsets[offset]
+
+    def chats_for(self, platform_name):
+        return self.by_platform.get(platform_name, set())
+
+    def chats_for_reminder(self, platform_name, offset):
+        return self.by_offset.get(platform_name, {}).get(offset, set())
+
+    def offsets(self):
+        """Return every reminder offset used by at least one subscribed chat."""
+        result = set()
+        for offsets in self.by_offset.values():
+            result.update(offsets)
+        return result
+
+subscriptions = SubscriptionIndex()
+
+NEW_CHAT_FLUSH_INTERVAL = 5
+
+class NewChatBuffer:
+    """Chats picked up by auto_subscribe that still have to be written to SQLite."""
+
+    def __init__(self):
+        self.pending = set()
+
+    def add(self, chat_id):
+        self.pending.add(chat_id)
+
+    def discard(self, chat_id):
+        self.pending.discard(chat_id)
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, set()
+        try:
+            await db.run(insert_chats, list(batch))
+        except Exception:
+            self.pending |= batch
+            raise
+
+new_chats = NewChatBuffer()
+
+async def flush_new_chats(context: ContextTypes.DEFAULT_TYPE):
+    await new_chats.flush()
+
+CHAT_CHANGES_INTERVAL = 10
+
+class ChatChangeFeed:
+    """Replays chats dropped or migrated by the senders into the in-memory indexes.
+
+    The senders may run in other processes, so they only write chat_changes;
+    every process holding subscriptions follows the table from where it was
+    when the indexes were loaded.
+    """
+
+    def __init__(self):
+        self.last_id = 0
+
+    async def load(self):
+        row = await db.fetchone("SELECT COALESCE(MAX(id), 0) FROM chat_changes")
+        self.last_id = row[0]
+
+    async def apply(self):
+        rows = await db.fetchall(
+            "SELECT id, chat_id, new_chat_id FROM chat_changes WHERE id>? ORDER BY id",
+            (self.last_id,),
+        )
+        for row_id, chat_id, new_chat_id in rows:
+            self.last_id = row_id
+            settings = settings_store.settings.pop(chat_id, None)
+            subscribed = chat_id in subscriptions
+            subscriptions.remove(chat_id)
+            new_chats.discard(chat_id)
+            if new_chat_id is None:
+                continue
+            if settings is not None:
+                settings_store.settings[new_chat_id] = settings
+            if subscribed:
+                subscriptions.add(new_chat_id, settings_store.get(new_chat_id))
+        if rows:
+            logger.info(
+                "Applied %d chat removals/migrations, %d chats subscribed",
+                len(rows), len(subscriptions),
+            )
+
+chat_changes = ChatChangeFeed()
+
+async def apply_chat_changes(context: ContextTypes.DEFAULT_TYPE):
+    await chat_changes.apply()
+
+# A reminder whose fire time passed less than this long ago (e.g. while the bot
+# was restarting) is still sent instead of being dropped.
+REMINDER_GRACE_SECONDS = 60
+
+class ReminderScheduler:
+    """Fires each (contest, offset) reminder as a one-shot job at its exact time.
+
+    Entries are grouped per contest so a new or rescheduled contest re-plans
+    only its own jobs; sync() re-plans everything after settings change.
+    """
+
+    def __init__(self):
+        # contest_id -> offset -> [fire_at, job]; job is None once it has fired
+        self.entries = {}
+
+    def plan(self, job_queue, contest, offsets):
+        now = time.time()
+        wanted = {}
+        if contest["start"] > now:
+            for offset in offsets:
+                fire_at = contest["start"] - offset
+                if fire_at >= now - REMINDER_GRACE_SECONDS:
+                    wanted[offset] = fire_at
+
+        entries = self.entries.setdefault(contest["id"], {})
+        for offset in list(entries):
+            if wanted.get(offset) != entries[offset][0]:
+                self._cancel(entries.pop(offset))
+        for offset, fire_at in wanted.items():
+            entry = entries.get(offset)
+            if entry is not None:
+                if entry[1] is not None:
+                    entry[1].data = (contest, offset)
+                continue
+            job = job_queue.run_once(
+                send_reminder,
+                when=max(0.0, fire_at - now),
+                data=(contest, offset),
+                name=f"reminder:{contest['id']}:{offset}",
+            )
+            entries[offset] = [fire_at, job]
+        if not entries:
+            del self.entries[contest["id"]]
+
+    def cancel_contest(self, contest_id):
+        for entry in self.entries.pop(contest_id, {}).values():
+            self._cancel(entry)
+
+    def sync(self, job_queue, contests, offsets):
+        current = {contest["id"] for contest in contests}
+        for contest_id in list(self.entries):
+            if contest_id not in current:
+                self.cancel_contest(contest_id)
+        for contest in contests:
+            self.plan(job_queue, contest, offsets)
+
+    def pending(self):
+        """Number of reminder jobs that have not fired yet."""
+        return sum(
+            1
+            for entries in self.entries.values()
+            for entry in entries.values()
+            if entry[1] is not None
+        )
+
+    def mark_fired(self, contest_id, offset):
+        entry = self.entries.get(contest_id, {}).get(offset)
+        if entry is not None:
+            entry[1] = None
+
+    def _cancel(self, entry):
+        if entry[1] is not None:
+            entry[1].schedule_removal()
+
+reminder_scheduler = ReminderScheduler()
+
+def reschedule_reminders(job_queue):
+    """Re-plan reminders against the cached contests after settings change."""
+    reminder_scheduler.sync(job_queue, contest_cache.contests, subscriptions.offsets())
+
+async def send_reminder(context: ContextTypes.DEFAULT_TYPE):
+    contest, offset = context.job.data
+    reminder_scheduler.mark_fired(contest["id"], offset)
+
+    chat_ids = list(subscriptions.chats_for_reminder(contest["platform"], offset))
+    text = render_cache.reminder(contest, offset)
+    available_at = time.time() + DIGEST_WINDOW
+    if await db.run(record_reminders, contest["id"], offset, chat_ids, text, available_at):
+        outbox.notify()
 
 async def check_contests(context: ContextTypes.DEFAULT_TYPE):
-    app = context.application
-    codeforces_task = asyncio.to_thread(fetch_codeforces)
-    leetcode_task = asyncio.to_thread(fetch_leetcode)
-    atcoder_task = asyncio.to_thread(fetch_atcoder)
-    codechef_task = asyncio.to_thread(fetch_codechef)
-    codeforces, leetcode, atcoder, codechef = await asyncio.gather(
-        codeforces_task, leetcode_task, atcoder_task, codechef_task
-    )
-    all_contests = codeforces + leetcode + atcoder + codechef
-    now = int(datetime.datetime.now(datetime.timezone.utc).timestamp())
+    with profiler.capture("tick", "check_contests") as capture:
+        capture.idle = not await run_contest_check(context)
 
-    cursor.execute("SELECT chat_id FROM chats")
-    chat_rows = cursor.fetchall()
-    chat_settings = {}
-    for row in chat_rows:
-        chat_id = row[0]
-        chat_settings[chat_id] = load_chat_settings(chat_id)
-
-    for contest in all_contests:
-        cursor.execute("SELECT id FROM contests WHERE id=?", (contest["id"],))
-        if not cursor.fetchone():
-            cursor.execute("INSERT INTO contests VALUES (?, ?, ?, ?)",
-                           (contest["id"], contest["name"], contest["start"], contest["platform"]))
-            conn.commit()
-            for chat_id, settings in chat_settings.items():
-                if contest["platform"] in settings["platforms"]:
-                    try:
-                        await app.bot.send_message(
-                            chat_id=chat_id,
-                            text=(
-                                "🆕 New Contest Published!\n\n"
-                                f"{contest['name']}\n"
-                                f"Platform: {contest['platform']}\n"
-                                f"{contest['url']}"
-                            ),
-                        )
-                    except Exception as exc:
-                        logger.warning("Failed to send message to %s: %s", chat_id, exc)
-
-        remaining = contest["start"] - now
-        if remaining <= 0:
-            continue
-        for chat_id, settings in chat_settings.items():
-            if contest["platform"] not in settings["platforms"]:
+async def run_contest_check(context):
+    """Run one contest check; returns whether a source was fetched or changed."""
+    # Sending is timed separately (bot_send_seconds) since the outbox drains
+    # independently of the check.
+    with metrics.time("bot_check_phase_seconds", phase="fetch"):
+        refreshed = await contest_cache.refresh_due()
+    diffs = []
+    with metrics.time("bot_check_phase_seconds", phase="diff"):
+        # Every source, not only the ones refreshed just now: a command may
+        # have refreshed one, or it may hold a snapshot restored at startup.
+        for source in contest_cache.sources.values():
+            if source.contests is None:
                 continue
-            for r in settings["reminders"]:
-                if r - 60 <= remaining <= r + 60:
-                    cursor.execute(
-                        "SELECT 1 FROM reminders WHERE contest_id=? AND reminder_seconds=? AND chat_id=?",
-                        (contest["id"], r, chat_id),
-                    )
-                    if cursor.fetchone():
-                        continue
-                    cursor.execute(
-                        "INSERT INTO reminders VALUES (?, ?, ?)",
-                        (contest["id"], r, chat_id),
-                    )
-                    conn.commit()
-                    time_str = str(datetime.timedelta(seconds=r))
-                    try:
-                        await app.bot.send_message(
-                            chat_id=chat_id,
-                            text=(
-                                f"⏰ Reminder ({time_str} left)\n\n"
-                                f"{contest['name']}\n"
-                                f"Platform: {contest['platform']}\n"
-                                f"{contest['url']}"
-                            ),
-                        )
-                    except Exception as exc:
-                        logger.warning("Failed to send message to %s: %s", chat_id, exc)
+            diff = snapshot_tracker.diff(source.platform, source.contests)
+            if diff is not None:
+                diffs.append(diff)
+
+    if diffs:
+        with metrics.time("bot_check_phase_seconds", phase="render"):
+            changed = [c for d in diffs for c in d.added + d.rescheduled + d.updated]
+            announcements = {
+                c["id"]: (render_cache.new_contest(c), list(subscriptions.chats_for(c["platform"])))
+                for d in diffs for c in d.added
+            }
+        with metrics.time("bot_check_phase_seconds", phase="queue"):
+            new_ids, moved_ids = await db.run(
+                store_contests, changed, announcements, time.time() + DIGEST_WINDOW
+            )
+        if new_ids:
+            outbox.notify()
+        new_ids, moved_ids = set(new_ids), set(moved_ids)
+        offsets = subscriptions.offsets()
+        with metrics.time("bot_check_phase_seconds", phase="plan"):
+            for diff in diffs:
+                for contest in diff.removed:
+                    reminder_scheduler.cancel_contest(contest["id"])
+                for contest in diff.rescheduled + [c for c in diff.added if c["id"] in moved_ids]:
+                    logger.info("%s was rescheduled to %s", contest["id"], contest["start"])
+                for contest in diff.added + diff.rescheduled + diff.updated:
+                    reminder_scheduler.plan(context.job_queue, contest, offsets)
+                snapshot_tracker.apply(diff)
+
+    if dispatcher.depth():
+        logger.info(
+            "Send queue depth %d, %.1f msg/s", dispatcher.depth(), dispatcher.throughput()
+        )
+    return bool(refreshed or diffs)
 
 async def broadcast(app, message):
-    cursor.execute("SELECT chat_id FROM chats")
-    chats = cursor.fetchall()
-    for chat in chats:
-        try:
-            await app.bot.send_message(chat_id=chat[0], text=message)
-        except Exception as exc:
-            logger.warning("Failed to send message to %s: %s", chat[0], exc)
+    await db.run(queue_broadcast, list(subscriptions.chats), message)
+    outbox.notify()
+
+# ================= MAINTENANCE =================
+
+RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", "30"))
+# Local (Asia/Dhaka) hour at which the daily maintenance runs.
+MAINTENANCE_HOUR = int(os.getenv("MAINTENANCE_HOUR", "4"))
+PRUNE_BATCH_SIZE = 5000
+# chat_changes rows kept for processes that are still replaying them.
+CHAT_CHANGES_KEEP = 10000
+
+async def run_maintenance(context: ContextTypes.DEFAULT_TYPE):
+    """Prune rows past the retention period and compact the database.
+
+    Deletes run in small transactions so reminders and sends queued on the
+    database thread in between are not held up for long.
+    """
+    started = time.monotonic()
+    cutoff = time.time() - RETENTION_DAYS * 86400
+    deleted = 0
+    while True:
+        batch = await db.run(prune_expired, cutoff, PRUNE_BATCH_SIZE)
+        if not batch:
+            break
+        deleted += batch
+    await db.run(compact_database, CHAT_CHANGES_KEEP)
+    logger.info(
+        "Maintenance pruned %d rows and compacted the database in %.1f s",
+        deleted, time.monotonic() - started,
+    )
 
 # ================= MAIN =================
 
+# "all" polls, plans and sends in one process; "planner" only queues
+# notifications and "sender" only drains the outbox, so senders can run as
+# separate processes against the same database file.
+BOT_ROLE = os.getenv("BOT_ROLE", "all")
+# Sender processes the main process starts next to itself; with any set it
+# leaves all sending to them.
+SENDER_PROCESSES = int(os.getenv("SENDER_PROCESSES", "0"))
+
+# Public base URL Telegram should post updates to; polling is used when unset.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8443")))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+# Updates handled at the same time; updates from one chat still run in order.
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "16"))
+# Every handler is a message handler, so Telegram needn't send anything else.
+ALLOWED_UPDATES = [Update.MESSAGE]
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """Runs up to max_concurrent_updates handlers at once, one at a time per chat.
+
+    Settings commands read a chat's settings and write them back whole, so
+    updates from the same chat keep their order; other chats don't wait.
+    A concurrency slot is only taken once the chat is free, so updates
+    queued behind one busy group don't hold up everyone else.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        # The base class's own limit is held while waiting for a chat, so it
+        # is left effectively unbounded and the real one is applied below.
+        super().__init__(sys.maxsize)
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # chat_id -> [lock, updates holding or waiting for it]
+        self._chat_locks = {}
+
+    async def do_process_update(self, update, coroutine):
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            async with self._slots:
+                await coroutine
+            return
+        entry = self._chat_locks.setdefault(chat.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0], self._slots:
+                await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._chat_locks[chat.id]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+def drains_outbox():
+    return BOT_ROLE == "sender" or (BOT_ROLE == "all" and SENDER_PROCESSES == 0)
+
+def register_gauges():
+    metrics.gauge("bot_subscribed_chats", lambda: len(subscriptions))
+    metrics.gauge("bot_pending_reminders", reminder_scheduler.pending)
+    metrics.gauge("bot_send_queue_depth", dispatcher.depth)
+    for source in contest_cache.sources.values():
+        metrics.gauge(
+            "bot_source_age_seconds",
+            lambda source=source: round(source.age() or 0, 1),
+            platform=source.platform,
+        )
+        metrics.gauge(
+            "bot_source_failures", lambda source=source: source.failures, platform=source.platform
+        )
+
+async def post_init(app) -> None:
+    """Build the subscription index and start the send workers."""
+    await chat_changes.load()
+    await settings_store.load()
+    await subscriptions.load()
+    restored = await contest_cache.restore()
+    logger.info(
+        "Loaded %d chats and %d contests from the last snapshot", len(subscriptions), restored
+    )
+    if drains_outbox():
+        dispatcher.start(app.bot)
+        outbox.start()
+    register_gauges()
+    app.bot_data["metrics_server"] = await start_metrics_server(METRICS_PORT)
+
+async def post_shutdown(app) -> None:
+    """Flush pending chats, stop the send workers and close the HTTP pool."""
+    await new_chats.flush()
+    if drains_outbox():
+        await stop_sending()
+    if app.bot_data.get("metrics_server") is not None:
+        app.bot_data["metrics_server"].close()
+    await http_client.close()
+
+async def stop_sending():
+    await outbox.stop()
+    await dispatcher.stop()
+    await outbox.release()
+
+async def run_sender():
+    """Drain the outbox until interrupted, without polling Telegram for updates."""
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stopped.set)
+        except NotImplementedError:
+            # Windows event loops don't support signal handlers; Ctrl+C still
+            # cancels this coroutine and runs the cleanup below.
+            pass
+    request = HTTPXRequest(connection_pool_size=SEND_WORKERS)
+    metrics.gauge("bot_send_queue_depth", dispatcher.depth)
+    metrics_server = await start_metrics_server(METRICS_PORT)
+    async with Bot(TOKEN, base_url=TELEGRAM_API_URL, request=request) as bot:
+        dispatcher.start(bot)
+        outbox.start()
+        try:
+            await stopped.wait()
+        finally:
+            await stop_sending()
+            if metrics_server is not None:
+                metrics_server.close()
+
+def spawn_senders():
+    """Start SENDER_PROCESSES sender processes sharing the global send rate.
+
+    Each sender serves its metrics on the port after the previous one.
+    """
+    env = dict(os.environ, BOT_ROLE="sender", SEND_RATE=str(SEND_RATE / SENDER_PROCESSES))
+    return [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)],
+            env=dict(env, METRICS_PORT=str(METRICS_PORT + i if METRICS_PORT else 0)),
+        )
+        for i in range(1, SENDER_PROCESSES + 1)
+    ]
+
 async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Log errors caused by updates."""
     logger.error("Exception while handling an update:", exc_info=context.error)
 
 def main():
+    db.open()
+    if BOT_ROLE == "sender":
+        logger.info("Starting outbox sender...")
+        try:
+            asyncio.run(run_sender())
+        except KeyboardInterrupt:
+            logger.info("Sender stopped by user")
+        finally:
+            db.close()
+        return
+
     logger.info("Starting Contest Reminder Bot...")
-    app = ApplicationBuilder().token(TOKEN).build()
+    senders = spawn_senders() if BOT_ROLE == "all" and SENDER_PROCESSES else []
+    app = (
+        ApplicationBuilder()
+        .token(TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+        .concurrent_updates(PerChatUpdateProcessor(UPDATE_CONCURRENCY))
+        .build()
+    )
     
     # Add error handler
     app.add_error_handler(error_handler)
     
     # Add command handlers
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("stop", stop))
-    app.add_handler(CommandHandler("help", help_command))
-    app.add_handler(CommandHandler("upcoming", upcoming))
-    app.add_handler(CommandHandler("next", next_contest))
-    app.add_handler(CommandHandler("recent", recent))
-    app.add_handler(CommandHandler("platform", platform))
-    app.add_handler(CommandHandler("reminders", reminders))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, auto_subscribe))
-
-    app.job_queue.run_repeating(check_contests, interval=300, first=5)
+    app.add_handler(CommandHandler("start", instrumented(start)))
+    app.add_handler(CommandHandler("stop", instrumented(stop)))
+    app.add_handler(CommandHandler("help", instrumented(help_command)))
+    app.add_handler(CommandHandler("upcoming", instrumented(upcoming)))
+    app.add_handler(CommandHandler("next", instrumented(next_contest)))
+    app.add_handler(CommandHandler("recent", instrumented(recent)))
+    app.add_handler(CommandHandler("platform", instrumented(platform)))
+    app.add_handler(CommandHandler("reminders", instrumented(reminders)))
+    app.add_handler(CommandHandler("profile", instrumented(profile_command)))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrumented(auto_subscribe)))
+
+    app.job_queue.run_repeating(check_contests, interval=CHECK_INTERVAL, first=5)
+    app.job_queue.run_repeating(
+        flush_new_chats, interval=NEW_CHAT_FLUSH_INTERVAL, first=NEW_CHAT_FLUSH_INTERVAL
+    )
+    app.job_queue.run_repeating(
+        apply_chat_changes, interval=CHAT_CHANGES_INTERVAL, first=CHAT_CHANGES_INTERVAL
+    )
+    app.job_queue.run_daily(
+        run_maintenance, time=datetime.time(hour=MAINTENANCE_HOUR, tzinfo=BD_TZ)
+    )
+    if hasattr(signal, "SIGUSR1"):
+        # kill -USR1 <pid> profiles the next few contest checks.
+        signal.signal(signal.SIGUSR1, request_profile_from_signal)
 
     logger.info("Bot started successfully!")
     try:
-        app.run_polling(allowed_updates=Update.ALL_TYPES)
+        if WEBHOOK_URL:
+            logger.info("Receiving updates by webhook on %s:%d", WEBHOOK_LISTEN, WEBHOOK_PORT)
+            app.run_webhook(
+                listen=WEBHOOK_LISTEN,
+                port=WEBHOOK_PORT,
+                url_path=WEBHOOK_PATH,
+                webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=ALLOWED_UPDATES,
+            )
+        else:
+            app.run_polling(allowed_updates=ALLOWED_UPDATES)
     except KeyboardInterrupt:
         logger.info("Bot stopped by user")
     except Exception as e:
         logger.error(f"Bot crashed with error: {e}")
         raise
     finally:
-        conn.close()
+        for sender in senders:
+            sender.terminate()
+        for sender in senders:
+            sender.wait()
+        db.close()
         logger.info("Database connection closed")
 
 if __name__ == "__main__":